@@ -0,0 +1,128 @@
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+
+# Optional settings, myconfig.py may leave them out
+try:
+    from myconfig import LOG_LEVEL
+except ImportError:
+    LOG_LEVEL = "INFO"
+try:
+    from myconfig import LOG_SAMPLE_EVERY
+except ImportError:
+    # One in every 100 per-request records, at tens of thousands of requests per second
+    # writing them all would cost more than handling the requests
+    LOG_SAMPLE_EVERY = 100
+
+# MARK: Constants
+DEBUG = logging.DEBUG
+INFO = logging.INFO
+WARNING = logging.WARNING
+ERROR = logging.ERROR
+# Every logger of the servers hangs from this one, which holds the level and the queue handler
+ROOT_LOGGER_NAME = "socketprotobuf"
+# Records waiting for the writer, anything beyond is dropped instead of blocking a request
+MAX_QUEUED_RECORDS = 10000
+LOG_FORMAT = "%(asctime)s %(levelname)-7s %(name)s: %(message)s"
+DATE_FORMAT = "%H:%M:%S"
+
+# MARK: Classes definitions
+# ********************************** SamplingFilter **********************************
+class SamplingFilter(logging.Filter):
+    # Keeps one in sampleEvery debug and info records, warnings and errors always.
+    # Counted per level, so a request's info line and its debug dump are kept together.
+    def __init__(self, sampleEvery):
+        logging.Filter.__init__(self)
+        self.sampleEvery = sampleEvery
+        self.seen = {}
+
+    def filter(self, record):
+        if record.levelno >= WARNING:
+            return True
+        # Not locked, threads racing here only make sampling a little less exact
+        seen = self.seen[record.levelno] = self.seen.get(record.levelno, 0) + 1
+        return (seen - 1) % self.sampleEvery == 0
+# ********************************** SamplingFilter **********************************
+
+# ********************************** DroppingQueueHandler **********************************
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    # Hands records to the QueueListener's thread, which formats and writes them, so logging costs
+    # the caller a level check and an enqueue. A full queue drops records instead of blocking.
+    def __init__(self, recordQueue):
+        logging.handlers.QueueHandler.__init__(self, recordQueue)
+        # Records lost because the queue was full, reported once there is room again
+        self.dropped = 0
+
+    def prepare(self, record):
+        # Formatting is left to the writer thread: args must not change after the call,
+        # e.g. pass bytes, not a view of a buffer that is about to be reused
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            return
+        if self.dropped:
+            dropped, self.dropped = self.dropped, 0
+            report = logging.LogRecord(ROOT_LOGGER_NAME, WARNING, __file__, 0, "%s records dropped, the writer could not keep up", (dropped,), None)
+            try:
+                self.queue.put_nowait(report)
+            except queue.Full:
+                self.dropped += dropped
+# ********************************** DroppingQueueHandler **********************************
+
+# MARK: Functions
+def startListener():
+    # New queue and writer thread, at import and in every forked child, where the parent's thread does not exist
+    global queueListener
+    recordQueue = queue.Queue(MAX_QUEUED_RECORDS)
+    queueHandler.queue = recordQueue
+    queueHandler.dropped = 0
+    queueListener = logging.handlers.QueueListener(recordQueue, streamHandler)
+    queueListener.start()
+
+def stopListener():
+    # Write what is queued at exit. With the queue full there is no room for the stop signal, what is left is lost.
+    try:
+        queueListener.stop()
+    except queue.Full:
+        pass
+
+def parseLevel(level):
+    if isinstance(level, int):
+        return level
+    value = logging.getLevelName(str(level).upper())
+    if not isinstance(value, int):
+        raise ValueError("Unknown log level %r"%(level))
+    return value
+
+def getLogger(name, sampled=False):
+    # One logger per name, all sharing the process' writer thread. Loggers of per-request
+    # records are sampled, keeping one in LOG_SAMPLE_EVERY of their debug and info records.
+    logger = logging.getLogger("%s.%s"%(ROOT_LOGGER_NAME, name))
+    if sampled and LOG_SAMPLE_EVERY > 1 and not any(isinstance(f, SamplingFilter) for f in logger.filters):
+        logger.addFilter(SamplingFilter(LOG_SAMPLE_EVERY))
+    return logger
+
+def setLevel(level):
+    # Change the level of every logger, current and future
+    rootLogger.setLevel(parseLevel(level))
+
+streamHandler = logging.StreamHandler(sys.stdout)
+streamHandler.setFormatter(logging.Formatter(LOG_FORMAT, DATE_FORMAT))
+queueHandler = DroppingQueueHandler(None)
+queueListener = None
+rootLogger = logging.getLogger(ROOT_LOGGER_NAME)
+rootLogger.addHandler(queueHandler)
+rootLogger.setLevel(parseLevel(LOG_LEVEL))
+# Records stop here, whatever the application configures on the root logger
+rootLogger.propagate = False
+startListener()
+atexit.register(stopListener)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child = startListener)
@@ -0,0 +1,220 @@
+import asyncio
+import collections
+import socket
+
+from concurrent.futures import ThreadPoolExecutor
+
+from framing import FrameBuffer
+from framing import FRAME_HEADER
+from framing import FRAME_HEADER_SIZE
+from requestContext import RequestContext
+from requestContext import parseRequest
+from serverStats import getServerStats
+from asyncLogger import DEBUG
+from asyncLogger import getLogger
+from myconfig import TIMEOUT
+
+# uvloop is a drop-in, faster event loop. Use it when it is installed.
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
+# MARK: Constants
+log = getLogger("asyncServer")
+# Per-message records, sampled
+requestLog = getLogger("requests", sampled=True)
+# Pending connections the kernel keeps for us while the loop is busy
+DEFAULT_BACKLOG = 1024
+# Connections above this number are closed right after being accepted
+DEFAULT_MAX_CONNECTIONS = 10000
+# Threads running the requests that would block the loop, e.g. those forwarded to a sensor
+BLOCKING_WORKERS = 64
+# Requests of one connection waiting for an earlier response, reading stops beyond this
+MAX_PENDING_RESPONSES = 256
+
+# MARK: Classes definitions
+# ********************************** AsyncServer **********************************
+class AsyncServer(object):
+    # MARK: Constructor
+    def __init__(self, ip, port, handler, backlog=DEFAULT_BACKLOG, maxConnections=DEFAULT_MAX_CONNECTIONS, reusePort=False, isBlocking=None):
+        self.ip = ip
+        self.port = port
+        # Called as handler(context) with the RequestContext of every message, returns (stayInTouch, response)
+        self.handler = handler
+        # Called as isBlocking(context), True sends the request to a worker thread instead of handling it on the loop
+        self.isBlocking = isBlocking
+        self.backlog = backlog
+        self.maxConnections = maxConnections
+        # Lets several worker processes bind the same port
+        self.reusePort = reusePort
+        self.stats = getServerStats()
+        self.connections = set()
+
+    # MARK: Methods
+    def startTCPServer(self):
+        if uvloop is not None:
+            asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+        asyncio.run(self.serveForever())
+
+    async def serveForever(self):
+        loop = asyncio.get_running_loop()
+        loop.set_default_executor(ThreadPoolExecutor(BLOCKING_WORKERS))
+        server = await loop.create_server(lambda: TCPClientProtocol(self), self.ip, self.port,
+                                          family=socket.AF_INET, backlog=self.backlog, reuse_address=True,
+                                          reuse_port=self.reusePort or None)
+        # Server's up
+        print("Server is up and ready to receive connections in ASYNC TCP MODE! IP '%s' and PORT '%s'"%(self.ip, self.port))
+
+        # One periodic sweep closes idle clients, instead of one timer per connection
+        if TIMEOUT:
+            loop.call_later(TIMEOUT, self.closeIdleConnections, loop)
+
+        async with server:
+            await server.serve_forever()
+
+    def closeIdleConnections(self, loop):
+        deadline = loop.time() - TIMEOUT
+        for connection in [c for c in self.connections if c.lastActivity < deadline]:
+            log.info("Client timed out from IP %s", connection.clientAddress[0])
+            connection.transport.close()
+        loop.call_later(TIMEOUT, self.closeIdleConnections, loop)
+# ********************************** AsyncServer **********************************
+
+# ********************************** TCPClientProtocol **********************************
+class TCPClientProtocol(asyncio.BufferedProtocol):
+    # A BufferedProtocol lets the loop receive straight into the connection's frame buffer
+    # MARK: Constructor
+    def __init__(self, server):
+        self.server = server
+        self.transport = None
+        self.clientAddress = None
+        self.frameBuffer = FrameBuffer()
+        self.lastActivity = 0
+        # Requests not answered yet, in the order they arrived: the RequestContext of one waiting for its turn,
+        # the future of the one running on a worker thread, or a (stayInTouch, response) tuple. Requests run and
+        # responses go out in that order, as on the threaded engine.
+        self.pending = collections.deque()
+        # Reading stops while too many requests are pending or the client does not read its responses
+        self.readingPaused = False
+        self.writingPaused = False
+
+    # MARK: Methods
+    def connection_made(self, transport):
+        self.transport = transport
+        self.clientAddress = transport.get_extra_info("peername")
+
+        if len(self.server.connections) >= self.server.maxConnections:
+            log.warning("Connection limit of %s reached, refusing client from IP %s", self.server.maxConnections, self.clientAddress[0])
+            transport.close()
+            return
+
+        self.server.connections.add(self)
+        self.server.stats.recordConnectionOpened()
+        self.lastActivity = asyncio.get_running_loop().time()
+        log.info("Client connected from IP %s", self.clientAddress[0])
+
+    def get_buffer(self, sizehint):
+        return self.frameBuffer.writableView()
+
+    def buffer_updated(self, nbytes):
+        self.lastActivity = asyncio.get_running_loop().time()
+        self.server.stats.recordBytesIn(nbytes)
+
+        try:
+            messagesFromClient = self.frameBuffer.bufferUpdated(nbytes)
+        except ValueError as e:
+            log.warning("Dropping client from IP %s: %s", self.clientAddress[0], e)
+            self.server.stats.recordError()
+            self.transport.close()
+            return
+
+        for messageFromClient in messagesFromClient:
+            context = parseRequest(messageFromClient, self.clientAddress)
+            requestLog.info("MESSAGE FROM IP %s: type %s, %s bytes", self.clientAddress[0], context.message.type, len(messageFromClient))
+            if requestLog.isEnabledFor(DEBUG):
+                # The full dump is formatted by the log writer, the message is not reused
+                requestLog.debug("MESSAGE FROM IP %s: %s", self.clientAddress[0], context.message)
+            self.pending.append(context)
+
+        self.flushResponses()
+        for context in self.pending:
+            # Still waiting behind a running request, while the next read overwrites the buffer their frames are in
+            if isinstance(context, RequestContext) and isinstance(context.raw, memoryview):
+                context.raw = bytes(context.raw)
+        if len(self.pending) >= MAX_PENDING_RESPONSES and not self.readingPaused:
+            self.readingPaused = True
+            self.transport.pause_reading()
+
+    def handleRequest(self, context):
+        # Handle the message according to received signal, returns (stayInTouch, response) or the future of both
+        if self.server.isBlocking is not None and self.server.isBlocking(context):
+            # Waiting on the loop would stall every client, a worker thread waits instead
+            if isinstance(context.raw, memoryview):
+                context.raw = bytes(context.raw)
+            future = asyncio.get_running_loop().run_in_executor(None, self.server.handler, context)
+            future.add_done_callback(self.flushResponses)
+            return future
+        return self.server.handler(context)
+
+    def flushResponses(self, future=None):
+        # Run the requests whose turn has come and write their responses, up to the first request still running
+        if self.transport.is_closing():
+            # The client left while its requests were running
+            self.pending.clear()
+            return
+
+        stayInTouch = True
+        responses = []
+        bytesOut = 0
+        while self.pending and stayInTouch:
+            result = self.pending[0]
+            if isinstance(result, RequestContext):
+                result = self.pending[0] = self.handleRequest(result)
+            if isinstance(result, asyncio.Future):
+                if not result.done():
+                    break
+                try:
+                    result = result.result()
+                except Exception as e:
+                    log.warning("Dropping client from IP %s: %s", self.clientAddress[0], e)
+                    self.server.stats.recordError()
+                    self.pending.clear()
+                    self.transport.close()
+                    return
+            self.pending.popleft()
+            stayInTouch, response = result
+            responses.append(FRAME_HEADER.pack(len(response)))
+            responses.append(response)
+            bytesOut += FRAME_HEADER_SIZE + len(response)
+
+        # Reply client, headers and responses ready together go out together, vectored where the loop supports it
+        if responses:
+            self.transport.writelines(responses)
+            self.server.stats.recordBytesOut(bytesOut)
+
+        # Close connection when user sends a CLOSE signal
+        if not stayInTouch:
+            self.pending.clear()
+            self.transport.close()
+        elif self.readingPaused and len(self.pending) < MAX_PENDING_RESPONSES:
+            self.readingPaused = False
+            if not self.writingPaused:
+                self.transport.resume_reading()
+
+    # Stop reading from a client that does not read its responses
+    def pause_writing(self):
+        self.writingPaused = True
+        self.transport.pause_reading()
+
+    def resume_writing(self):
+        self.writingPaused = False
+        if not self.readingPaused:
+            self.transport.resume_reading()
+
+    def connection_lost(self, exc):
+        if self in self.server.connections:
+            self.server.connections.discard(self)
+            self.server.stats.recordConnectionClosed()
+            log.info("Client disconnected from IP %s", self.clientAddress[0])
+# ********************************** TCPClientProtocol **********************************
@@ -0,0 +1,309 @@
+# Closed-loop load generator for server.py, everything runs on localhost.
+#
+#   python -m benchmarks.loadGenerator --engine threaded --clients 32 --depth 8 --duration 10 --output bench.json
+#   python -m benchmarks.loadGenerator --connect 127.0.0.1:5050 --mix UPTIME_REQUEST=1,REQNUM_REQUEST=3
+#   python -m benchmarks.loadGenerator --udp --clients 8 --duration 5
+#
+# Every client keeps --depth requests in flight (pipelined through request_id) and sends a new one
+# as soon as a response comes back. Results are written as JSON: throughput, errors and latency
+# percentiles in microseconds, overall and per MessageType.
+import argparse
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+import message_pb2
+
+from framing import FrameBuffer
+from framing import encodeFrame
+from framing import appendRequestId
+from latencyHistogram import LatencyHistogram
+from messageBatch import BatchBuffer
+from myconfig import BUFFSIZE
+
+# MARK: Constants
+# Closing the connection in the middle of a run would measure reconnects, not requests,
+# and stats requests are monitoring calls, far heavier than what the server usually answers
+EXCLUDED_FROM_DEFAULT_MIX = ("CLOSE_CONNECTION_REQUEST", "DEFAULT", "STATS_REQUEST", "STATS_RESPONSE")
+# Readings carried by every BATCH_REQUEST of the mix
+BATCH_SIZE = 16
+# Seconds to wait for the server subprocess to start listening
+SERVER_START_TIMEOUT = 10.0
+
+# MARK: Classes definitions
+# ********************************** RequestFactory **********************************
+class RequestFactory(object):
+    # MARK: Constructor
+    def __init__(self, mix, payloadSize):
+        # Pre-serialized request of every type in the mix, only request_id changes per request
+        self.requests = {}
+        self.names = []
+        self.weights = []
+        for name, weight in mix:
+            self.requests[name] = self.buildRequest(name, payloadSize)
+            self.names.append(name)
+            self.weights.append(weight)
+
+    # MARK: Methods
+    def buildRequest(self, name, payloadSize):
+        messageType = message_pb2.Message.MessageType.Value(name)
+        message = message_pb2.Message()
+        message.body.description = "x" * payloadSize
+        message.type = messageType
+        message.sender.ip = "localhost"
+        message.sender.port = 5050
+
+        if messageType == message_pb2.Message.MessageType.BATCH_REQUEST:
+            batch = BatchBuffer("localhost", 5050, BATCH_SIZE)
+            reading = self.buildRequest("READ_SENSOR_DATA_RESPONSE", payloadSize)
+            for _ in range(BATCH_SIZE):
+                batch.add(reading)
+            return batch.serialize()
+        return message.SerializeToString()
+
+    def pick(self, rng):
+        name = rng.choices(self.names, self.weights)[0] if len(self.names) > 1 else self.names[0]
+        return name, self.requests[name]
+# ********************************** RequestFactory **********************************
+
+# ********************************** TCPClient **********************************
+class TCPClient(object):
+    # MARK: Constructor
+    def __init__(self, address, factory, depth, deadline, seed):
+        self.address = address
+        self.factory = factory
+        self.depth = depth
+        self.deadline = deadline
+        self.rng = random.Random(seed)
+        self.histograms = {}
+        self.errors = 0
+        self.completed = 0
+
+    # MARK: Methods
+    def run(self):
+        connection = socket.create_connection(self.address)
+        connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        frameBuffer = FrameBuffer()
+        # request_id -> (message type name, send time)
+        inFlight = {}
+        nextRequestId = 1
+
+        try:
+            while True:
+                now = time.time()
+                if now < self.deadline:
+                    # Closed loop: top the window up to depth requests, all in a single write
+                    frames = []
+                    while len(inFlight) + len(frames) < self.depth:
+                        name, request = self.factory.pick(self.rng)
+                        frames.append(encodeFrame(appendRequestId(request, nextRequestId)))
+                        inFlight[nextRequestId] = (name, now)
+                        nextRequestId += 1
+                    if frames:
+                        connection.sendall(b"".join(frames))
+                elif not inFlight:
+                    break
+
+                frames = frameBuffer.recvFrames(connection, BUFFSIZE)
+                if frames is None:
+                    self.errors += len(inFlight)
+                    break
+
+                receivedAt = time.time()
+                for frame in frames:
+                    response = message_pb2.Message()
+                    response.ParseFromString(frame)
+                    pending = inFlight.pop(response.request_id, None)
+                    if pending is None:
+                        self.errors += 1
+                        continue
+                    name, sentAt = pending
+                    self.histogramFor(name).record((receivedAt - sentAt) * 1000000)
+                    self.completed += 1
+        except socket.error:
+            self.errors += len(inFlight) or 1
+        finally:
+            connection.close()
+
+    def histogramFor(self, name):
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = LatencyHistogram()
+        return histogram
+# ********************************** TCPClient **********************************
+
+# ********************************** UDPClient **********************************
+class UDPClient(object):
+    # MARK: Constructor
+    def __init__(self, address, request, deadline, timeout):
+        self.address = address
+        self.request = request
+        self.deadline = deadline
+        self.timeout = timeout
+        self.histograms = {"MULTICAST_SENSOR_FINDER": LatencyHistogram()}
+        self.errors = 0
+        self.completed = 0
+
+    # MARK: Methods
+    def run(self):
+        # UDP has no pipelining, each probe waits for its ACK or counts as lost after timeout
+        connection = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        connection.settimeout(self.timeout)
+        histogram = self.histograms["MULTICAST_SENSOR_FINDER"]
+        try:
+            while time.time() < self.deadline:
+                sentAt = time.time()
+                connection.sendto(self.request, self.address)
+                try:
+                    connection.recvfrom(BUFFSIZE)
+                except socket.timeout:
+                    self.errors += 1
+                    continue
+                histogram.record((time.time() - sentAt) * 1000000)
+                self.completed += 1
+        finally:
+            connection.close()
+# ********************************** UDPClient **********************************
+
+# MARK: Functions
+def parseMix(text):
+    if not text:
+        return [(name, 1.0) for name in message_pb2.Message.MessageType.keys() if name not in EXCLUDED_FROM_DEFAULT_MIX]
+    mix = []
+    for item in text.split(","):
+        name, _, weight = item.partition("=")
+        message_pb2.Message.MessageType.Value(name)
+        mix.append((name, float(weight or 1)))
+    return mix
+
+def findFreePort(kind):
+    probe = socket.socket(socket.AF_INET, kind)
+    probe.bind(("127.0.0.1", 0))
+    port = probe.getsockname()[1]
+    probe.close()
+    return port
+
+def startServerProcess(engine, udp):
+    # The server runs in its own process, so it does not share the GIL with the load generator
+    repositoryRoot = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    if udp:
+        port = findFreePort(socket.SOCK_DGRAM)
+        # Every client probes from localhost as fast as it can, so per-source rate limiting is off
+        code = ("import server, time; from myconfig import MULTICAST_GROUP_IP; from multicastReceiver import MulticastReceiver; "
+                "MulticastReceiver('127.0.0.1', %d, MULTICAST_GROUP_IP, server.handleRequest, sourceRate=None).waitForFinderSignal(); "
+                "time.sleep(1e9)"%(port))
+    else:
+        port = findFreePort(socket.SOCK_STREAM)
+        code = "import server; server.startServer('127.0.0.1', %d, %r)"%(port, engine)
+
+    process = subprocess.Popen([sys.executable, "-c", code], cwd=repositoryRoot,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.STDOUT)
+    if not udp:
+        waitForPort(port, process)
+    else:
+        time.sleep(0.5)
+    return process, ("127.0.0.1", port)
+
+def waitForPort(port, process):
+    deadline = time.time() + SERVER_START_TIMEOUT
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("Server process exited with code %s"%(process.returncode))
+        try:
+            socket.create_connection(("127.0.0.1", port), 0.2).close()
+            return
+        except socket.error:
+            time.sleep(0.05)
+    raise RuntimeError("Server did not start listening on port %s"%(port))
+
+def runBenchmark(options):
+    process = None
+    if options.connect:
+        host, _, port = options.connect.rpartition(":")
+        address = (host, int(port))
+    else:
+        process, address = startServerProcess(options.engine, options.udp)
+
+    try:
+        startedAt = time.time()
+        deadline = startedAt + options.duration
+        if options.udp:
+            factory = RequestFactory([("MULTICAST_SENSOR_FINDER", 1.0)], options.payload)
+            request = factory.requests["MULTICAST_SENSOR_FINDER"]
+            clients = [UDPClient(address, request, deadline, options.udp_timeout) for _ in range(options.clients)]
+        else:
+            factory = RequestFactory(parseMix(options.mix), options.payload)
+            clients = [TCPClient(address, factory, options.depth, deadline, options.seed + index) for index in range(options.clients)]
+
+        threads = [threading.Thread(target=client.run) for client in clients]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.time() - startedAt
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+    overall = LatencyHistogram()
+    perType = {}
+    for client in clients:
+        for name, histogram in client.histograms.items():
+            perType.setdefault(name, LatencyHistogram()).merge(histogram)
+            overall.merge(histogram)
+
+    completed = sum(client.completed for client in clients)
+    return {
+        "config": {
+            "engine": "external" if options.connect else options.engine,
+            "transport": "udp" if options.udp else "tcp",
+            "clients": options.clients,
+            "depth": 1 if options.udp else options.depth,
+            "payloadBytes": options.payload,
+            "durationSeconds": options.duration,
+            "mix": dict(parseMix(options.mix)) if not options.udp else {"MULTICAST_SENSOR_FINDER": 1.0},
+        },
+        "elapsedSeconds": elapsed,
+        "requests": completed,
+        "errors": sum(client.errors for client in clients),
+        "throughputPerSecond": completed / elapsed if elapsed else 0.0,
+        "latencyMicroseconds": overall.summary(),
+        "latencyHistogramMicroseconds": overall.buckets(),
+        "latencyByTypeMicroseconds": dict((name, histogram.summary()) for name, histogram in sorted(perType.items())),
+    }
+
+def parseArguments(arguments=None):
+    parser = argparse.ArgumentParser(description="Closed-loop load generator for server.py")
+    parser.add_argument("--engine", choices=("threaded", "async"), default="threaded", help="server engine to start")
+    parser.add_argument("--connect", help="host:port of an already running server instead of starting one")
+    parser.add_argument("--udp", action="store_true", help="load the multicast receiver with finder probes instead")
+    parser.add_argument("--clients", type=int, default=16, help="concurrent connections")
+    parser.add_argument("--depth", type=int, default=1, help="requests in flight per connection")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds to run")
+    parser.add_argument("--payload", type=int, default=16, help="bytes in every request description")
+    parser.add_argument("--mix", help="comma separated TYPE=weight list, defaults to every request type")
+    parser.add_argument("--udp-timeout", type=float, default=1.0, help="seconds before a UDP probe counts as lost")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="JSON file for the results, printed to stdout when omitted")
+    return parser.parse_args(arguments)
+
+def main():
+    options = parseArguments()
+    results = runBenchmark(options)
+    report = json.dumps(results, indent=2, sort_keys=True)
+    if options.output:
+        with open(options.output, "w") as output:
+            output.write(report)
+        latency = results["latencyMicroseconds"]
+        print("%s requests/s, p50 %sus, p99 %sus, p999 %sus, %s errors -> %s"%(int(results["throughputPerSecond"]), latency["p50"], latency["p99"], latency["p999"], results["errors"], options.output))
+    else:
+        print(report)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+# Micro-benchmarks of the protobuf encode/decode hot paths, run once per protobuf backend.
+#
+#   python -m benchmarks.protoMicrobench --output proto.json
+#   python -m benchmarks.protoMicrobench --backends upb --number 100000
+#
+# Every backend runs in its own interpreter, selected with PROTOCOL_BUFFERS_PYTHON_IMPLEMENTATION.
+# For every path the report holds the best time per call in nanoseconds, the peak memory a single
+# call allocates, and the memory still held after many calls. The message pool's allocation
+# counters show how many reply messages were created versus reused during the whole run.
+import argparse
+import json
+import os
+import subprocess
+import sys
+import timeit
+import tracemalloc
+
+# MARK: Constants
+BACKENDS = ("upb", "cpp", "python")
+# Calls kept in the retained memory measurement
+RETAINED_CALLS = 1000
+
+# MARK: Functions
+def buildCases():
+    # Imported here, so the protobuf backend is picked from this process' environment
+    import message_pb2
+    import server
+    from sensors.lamp import LampSensor
+    from requestContext import parseRequest
+    from sensors.runtime import parseSerializedStringIntoMessageObj
+
+    sensor = LampSensor("lamp-0")
+    finder = server.generateSensorFinderMessage()
+    reading = sensor.generateSensorDataMessage()
+
+    uptimeRequest = message_pb2.Message()
+    uptimeRequest.body.description = "uptime"
+    uptimeRequest.type = message_pb2.Message.MessageType.UPTIME_REQUEST
+    uptimeRequest = uptimeRequest.SerializeToString()
+    # Answered with a response serialized once, unlike sensor readings, which are registered and stored
+    serverFinder = message_pb2.Message()
+    serverFinder.body.description = "description"
+    serverFinder.type = message_pb2.Message.MessageType.MULTICAST_SERVER_FINDER
+    serverFinder = serverFinder.SerializeToString()
+    serverFinderContext = parseRequest(serverFinder)
+
+    return [
+        ("server.getProtoMessage", lambda: server.getProtoMessage("teste")),
+        ("server.parseMessage", lambda: server.parseMessage(finder)),
+        ("server.generateSensorFinderMessage", server.generateSensorFinderMessage),
+        ("sensors.runtime.parseSerializedStringIntoMessageObj", lambda: parseSerializedStringIntoMessageObj(reading)),
+        ("Sensor.generateSensorDataMessage", sensor.generateSensorDataMessage),
+        ("server.handleMessageAndGetResponse[static]", lambda: server.handleMessageAndGetResponse(serverFinder)),
+        ("server.handleMessageAndGetResponse[uptime]", lambda: server.handleMessageAndGetResponse(uptimeRequest)),
+        ("server.handleRequest[static, parsed once]", lambda: server.handleRequest(serverFinderContext)),
+    ]
+
+def measure(function, number, repeat):
+    bestSeconds = min(timeit.repeat(function, number=number, repeat=repeat))
+
+    tracemalloc.start()
+    function()
+    tracemalloc.reset_peak()
+    before = tracemalloc.get_traced_memory()[0]
+    function()
+    peakBytes = tracemalloc.get_traced_memory()[1] - before
+
+    before = tracemalloc.get_traced_memory()[0]
+    for _ in range(RETAINED_CALLS):
+        function()
+    retainedBytes = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+
+    return {
+        "nanosecondsPerCall": bestSeconds / number * 1e9,
+        "peakBytesPerCall": peakBytes,
+        "retainedBytesPerCall": float(retainedBytes) / RETAINED_CALLS,
+    }
+
+def runWorker(number, repeat):
+    from google.protobuf.internal import api_implementation
+
+    results = {"backend": api_implementation.Type(), "cases": {}}
+    for name, function in buildCases():
+        results["cases"][name] = measure(function, number, repeat)
+
+    from messagePool import getAllocationCounters
+    results["allocationCounters"] = getAllocationCounters()
+    return results
+
+def runBackend(backend, number, repeat):
+    repositoryRoot = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    environment = dict(os.environ, PROTOCOL_BUFFERS_PYTHON_IMPLEMENTATION=backend)
+    command = [sys.executable, "-m", "benchmarks.protoMicrobench", "--worker", "--number", str(number), "--repeat", str(repeat)]
+    worker = subprocess.Popen(command, cwd=repositoryRoot, env=environment, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    output, errors = worker.communicate()
+    if worker.returncode != 0:
+        lines = errors.decode("utf-8", "replace").strip().splitlines()
+        return {"backend": backend, "error": lines[-1] if lines else "exited with code %s"%(worker.returncode)}
+
+    results = json.loads(output.decode("utf-8"))
+    # protobuf silently falls back to another backend when the requested one is not built in
+    if results["backend"] != backend:
+        return {"backend": backend, "error": "not available, protobuf picked %s"%(results["backend"])}
+    return results
+
+def parseArguments(arguments=None):
+    parser = argparse.ArgumentParser(description="Protobuf encode/decode micro-benchmarks")
+    parser.add_argument("--backends", default=",".join(BACKENDS), help="comma separated protobuf backends to compare")
+    parser.add_argument("--number", type=int, default=20000, help="calls per timing run")
+    parser.add_argument("--repeat", type=int, default=5, help="timing runs, the best one is reported")
+    parser.add_argument("--output", help="JSON file for the results, printed to stdout when omitted")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    return parser.parse_args(arguments)
+
+def main():
+    options = parseArguments()
+    if options.worker:
+        print(json.dumps(runWorker(options.number, options.repeat)))
+        return
+
+    results = [runBackend(backend, options.number, options.repeat) for backend in options.backends.split(",")]
+    report = json.dumps(results, indent=2, sort_keys=True)
+    if options.output:
+        with open(options.output, "w") as output:
+            output.write(report)
+
+    for result in results:
+        if "error" in result:
+            print("%-8s %s"%(result["backend"], result["error"]))
+            continue
+        for name, case in sorted(result["cases"].items()):
+            print("%-8s %-55s %10.0f ns %8s B peak %8.1f B retained"%(result["backend"], name, case["nanosecondsPerCall"], case["peakBytesPerCall"], case["retainedBytesPerCall"]))
+        counters = result["allocationCounters"]
+        print("%-8s messages created %s, reused %s"%(result["backend"], counters["messagesCreated"], counters["messagesReused"]))
+    if not options.output:
+        print(report)
+
+if __name__ == "__main__":
+    main()
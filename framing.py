@@ -0,0 +1,153 @@
+import struct
+
+# MARK: Constants
+# Every message on a TCP stream travels as a frame: a 4-byte big-endian length prefix
+# followed by the serialized message_pb2.Message
+FRAME_HEADER = struct.Struct("!I")
+FRAME_HEADER_SIZE = FRAME_HEADER.size
+# Anything bigger than this is a corrupted stream or a misbehaving peer
+MAX_FRAME_SIZE = 16 * 1024 * 1024
+# Field number 4 (request_id) of Message with varint wire type
+REQUEST_ID_TAG = b"\x20"
+# Bytes preallocated for every connection's receive buffer, it grows only for frames that do not fit
+DEFAULT_BUFFER_CAPACITY = 16 * 1024
+# Never call recv with less free space than this
+MIN_READ_SIZE = 4096
+
+# MARK: Classes definitions
+# ********************************** FrameBuffer **********************************
+class FrameBuffer(object):
+    # Received bytes land straight in a preallocated buffer (recv_into) and frames are handed out
+    # as memoryview slices of it, so a frame is never copied between the socket and the parser.
+    # Frames are only valid until the next read: the space they use is reused for what comes next.
+    # MARK: Constructor
+    def __init__(self, maxFrameSize=MAX_FRAME_SIZE, capacity=DEFAULT_BUFFER_CAPACITY):
+        self.maxFrameSize = maxFrameSize
+        # Size the buffer returns to once a bigger frame has been consumed
+        self.capacity = capacity
+        self.buffer = bytearray(capacity)
+        self.view = memoryview(self.buffer)
+        # Received bytes not cut into frames yet are buffer[start:end]
+        self.start = 0
+        self.end = 0
+        # Whole frames already cut from the stream but not handed out by recvFrame yet
+        self.readyFrames = []
+
+    # MARK: Methods
+    def writableView(self, buffSize=None):
+        # Free space to receive into. Room is made first, so the frame being received always fits
+        # as a whole and can be parsed in place. A big frame gets room as its bytes actually arrive, at most
+        # as much again as received so far, never what its header claims: a 4-byte header alone must not
+        # cost MAX_FRAME_SIZE of memory.
+        pending = self.end - self.start
+        self.reserve(max(MIN_READ_SIZE, min(self.missingBytes(), pending)))
+        if buffSize is None:
+            return self.view[self.end:]
+        return self.view[self.end:self.end + buffSize]
+
+    def bufferUpdated(self, nbytes):
+        # nbytes were written at the start of writableView(), returns every frame they completed
+        self.end += nbytes
+        return self.cutFrames()
+
+    def feed(self, data):
+        # Append bytes received by somebody else (e.g. a plain asyncio.Protocol) and cut every complete frame.
+        # A single recv may carry many frames, or just a piece of one.
+        self.reserve(len(data))
+        self.view[self.end:self.end + len(data)] = data
+        return self.bufferUpdated(len(data))
+
+    def recvFrames(self, connection, buffSize=None):
+        # Read once from the socket, at most buffSize bytes, and return all frames completed by that read.
+        # Returns None when the peer has closed the connection.
+        received = connection.recv_into(self.writableView(buffSize))
+        if not received:
+            return None
+        return self.bufferUpdated(received)
+
+    def recvFrame(self, connection, buffSize=None):
+        # Block until one whole frame is available, keeping any extra frames for the next call.
+        # Returns None when the peer has closed the connection.
+        while not self.readyFrames:
+            frames = self.recvFrames(connection, buffSize)
+            if frames is None:
+                return None
+            # Kept across reads, so they cannot stay views of the buffer
+            self.readyFrames.extend(bytes(frame) for frame in frames)
+        return self.readyFrames.pop(0)
+
+    def cutFrames(self):
+        frames = []
+        offset = self.start
+        while self.end - offset >= FRAME_HEADER_SIZE:
+            frameEnd = offset + FRAME_HEADER_SIZE + self.frameSize(offset)
+            if frameEnd > self.end:
+                # Wait for the rest of this frame
+                break
+            frames.append(self.view[offset + FRAME_HEADER_SIZE:frameEnd])
+            offset = frameEnd
+
+        if offset == self.end:
+            # Everything was consumed, the next read starts at the beginning again
+            self.start = self.end = 0
+            if len(self.buffer) > self.capacity:
+                # Back to the usual size once a big frame is through. Frames just cut keep the old buffer alive.
+                self.buffer = bytearray(self.capacity)
+                self.view = memoryview(self.buffer)
+        else:
+            self.start = offset
+        return frames
+
+    def frameSize(self, offset):
+        frameSize = FRAME_HEADER.unpack_from(self.buffer, offset)[0]
+        if frameSize > self.maxFrameSize:
+            raise ValueError("Frame of %s bytes exceeds the limit of %s bytes"%(frameSize, self.maxFrameSize))
+        return frameSize
+
+    def missingBytes(self):
+        # Bytes still to come for the frame at start, 0 while its header is incomplete
+        pending = self.end - self.start
+        if pending < FRAME_HEADER_SIZE:
+            return 0
+        return FRAME_HEADER_SIZE + self.frameSize(self.start) - pending
+
+    def reserve(self, size):
+        # Make room for size more bytes after end
+        if self.end + size <= len(self.buffer):
+            return
+        pending = self.end - self.start
+        if pending + size > len(self.buffer):
+            # Not even an empty buffer fits it: a frame bigger than the buffer, grow it.
+            # A new bytearray, because resizing one that has views on it is not allowed.
+            buffer = bytearray(max(len(self.buffer) * 2, pending + size))
+            buffer[:pending] = self.view[self.start:self.end]
+            self.buffer = buffer
+            self.view = memoryview(buffer)
+        else:
+            # Move the partial frame to the front, the only copy, at most once per buffer fill
+            self.buffer[:pending] = self.buffer[self.start:self.end]
+        self.start = 0
+        self.end = pending
+# ********************************** FrameBuffer **********************************
+
+# MARK: Functions
+def encodeFrame(payload):
+    return FRAME_HEADER.pack(len(payload)) + payload
+
+def encodeVarint(value):
+    # Protobuf base 128 varint, used to splice fields into already serialized messages
+    encoded = bytearray()
+    while value > 0x7F:
+        encoded.append((value & 0x7F) | 0x80)
+        value >>= 7
+    encoded.append(value)
+    return bytes(encoded)
+
+def appendRequestId(serialized_message_string, requestId):
+    # Protobuf merges concatenated messages, so appending the request_id field to a serialized
+    # message sets it without parsing or copying a cached message into a new one
+    return serialized_message_string + REQUEST_ID_TAG + encodeVarint(requestId)
+
+def sendFrame(connection, payload):
+    # sendall keeps writing until the whole frame is out, unlike send
+    connection.sendall(encodeFrame(payload))
@@ -0,0 +1,101 @@
+# MARK: Constants
+# Values below 2^(SUB_BUCKET_BITS + 1) get a bucket each, above that every power of two is split
+# into 2^SUB_BUCKET_BITS buckets, so any recorded value is off by less than 1/64 (about 1.6%)
+SUB_BUCKET_BITS = 6
+SUB_BUCKET_COUNT = 1 << SUB_BUCKET_BITS
+LINEAR_LIMIT = SUB_BUCKET_COUNT * 2
+# Values are microseconds, anything above 2^36 (about 19 hours) is clamped
+MAX_VALUE = (1 << 36) - 1
+BUCKET_COUNT = LINEAR_LIMIT + (MAX_VALUE.bit_length() - SUB_BUCKET_BITS - 1) * SUB_BUCKET_COUNT
+# Integers in toList(): total, min and max values, then the bucket counts
+HISTOGRAM_LIST_SIZE = 3 + BUCKET_COUNT
+
+# MARK: Classes definitions
+# ********************************** LatencyHistogram **********************************
+class LatencyHistogram(object):
+    # MARK: Constructor
+    def __init__(self):
+        self.counts = [0] * BUCKET_COUNT
+        self.totalCount = 0
+        self.totalValue = 0
+        self.minValue = None
+        self.maxValue = 0
+
+    # MARK: Methods
+    def record(self, value):
+        # Constant time, no allocation: one bucket index and a few integer updates
+        value = min(max(int(value), 0), MAX_VALUE)
+        self.counts[bucketIndex(value)] += 1
+        self.totalCount += 1
+        self.totalValue += value
+        if self.minValue is None or value < self.minValue:
+            self.minValue = value
+        if value > self.maxValue:
+            self.maxValue = value
+
+    def merge(self, other):
+        for index, count in enumerate(other.counts):
+            if count:
+                self.counts[index] += count
+        self.totalCount += other.totalCount
+        self.totalValue += other.totalValue
+        if other.minValue is not None and (self.minValue is None or other.minValue < self.minValue):
+            self.minValue = other.minValue
+        self.maxValue = max(self.maxValue, other.maxValue)
+
+    def percentile(self, percent):
+        # Highest value equivalent to the bucket holding the given percentile
+        if not self.totalCount:
+            return 0
+        wanted = max(1, int(round(self.totalCount * percent / 100.0)))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= wanted:
+                return min(bucketUpperBound(index), self.maxValue)
+        return self.maxValue
+
+    def summary(self):
+        return {
+            "count": self.totalCount,
+            "min": self.minValue or 0,
+            "mean": float(self.totalValue) / self.totalCount if self.totalCount else 0.0,
+            "p50": self.percentile(50),
+            "p90": self.percentile(90),
+            "p99": self.percentile(99),
+            "p999": self.percentile(99.9),
+            "max": self.maxValue,
+        }
+
+    def toList(self):
+        # Flat list of integers, e.g. to share the histogram with other processes
+        return [self.totalValue, self.minValue or 0, self.maxValue] + self.counts
+
+    def buckets(self):
+        # (highest value of the bucket, count) of every non-empty bucket
+        return [(bucketUpperBound(index), count) for index, count in enumerate(self.counts) if count]
+# ********************************** LatencyHistogram **********************************
+
+# MARK: Functions
+def histogramFromList(values):
+    # Inverse of LatencyHistogram.toList()
+    histogram = LatencyHistogram()
+    histogram.counts = list(values[3:HISTOGRAM_LIST_SIZE])
+    histogram.totalCount = sum(histogram.counts)
+    histogram.totalValue = values[0]
+    histogram.minValue = values[1] if histogram.totalCount else None
+    histogram.maxValue = values[2]
+    return histogram
+
+def bucketIndex(value):
+    if value < LINEAR_LIMIT:
+        return value
+    shift = value.bit_length() - SUB_BUCKET_BITS - 1
+    return LINEAR_LIMIT + (shift - 1) * SUB_BUCKET_COUNT + (value >> shift) - SUB_BUCKET_COUNT
+
+def bucketUpperBound(index):
+    if index < LINEAR_LIMIT:
+        return index
+    shift = (index - LINEAR_LIMIT) // SUB_BUCKET_COUNT + 1
+    subBucket = (index - LINEAR_LIMIT) % SUB_BUCKET_COUNT + SUB_BUCKET_COUNT
+    return ((subBucket + 1) << shift) - 1
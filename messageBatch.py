@@ -0,0 +1,59 @@
+import message_pb2
+
+from framing import encodeVarint
+from framing import sendFrame
+
+# MARK: Constants
+# Readings buffered before the batch is considered full
+DEFAULT_BATCH_SIZE = 32
+# Field number 5 (batch) of Message with length-delimited wire type
+BATCH_TAG = b"\x2a"
+# Field number 2 (messages) of MessageBatch with length-delimited wire type
+BATCH_MESSAGES_TAG = b"\x12"
+
+# MARK: Classes definitions
+# ********************************** BatchBuffer **********************************
+class BatchBuffer(object):
+    # MARK: Constructor
+    def __init__(self, ip, port, batchSize=DEFAULT_BATCH_SIZE):
+        self.batchSize = batchSize
+        # Serialized items, each already wrapped as a MessageBatch.messages field
+        self.items = []
+
+        # Envelope and shared sender never change, so they are serialized once
+        envelope = message_pb2.Message()
+        envelope.body.description = "batch"
+        envelope.type = message_pb2.Message.MessageType.BATCH_REQUEST
+        self.envelope = envelope.SerializeToString()
+
+        batch = message_pb2.MessageBatch()
+        batch.sender.ip = ip
+        batch.sender.port = port
+        self.sharedSender = batch.SerializeToString()
+
+    # MARK: Methods
+    def add(self, serialized_message_string):
+        # Messages without a sender of their own get the batch's one on the server
+        self.items.append(BATCH_MESSAGES_TAG + encodeVarint(len(serialized_message_string)) + serialized_message_string)
+
+    def isFull(self):
+        return len(self.items) >= self.batchSize
+
+    def serialize(self):
+        batchField = self.sharedSender + b"".join(self.items)
+        return self.envelope + BATCH_TAG + encodeVarint(len(batchField)) + batchField
+
+    def drain(self):
+        # Serialized batch of everything buffered so far, leaving the buffer empty
+        serialized = self.serialize()
+        self.items = []
+        return serialized
+
+    def flush(self, connection):
+        # One frame, one write, for every buffered reading
+        if not self.items:
+            return 0
+        flushed = len(self.items)
+        sendFrame(connection, self.drain())
+        return flushed
+# ********************************** BatchBuffer **********************************
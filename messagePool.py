@@ -0,0 +1,86 @@
+import threading
+import message_pb2
+
+# MARK: Constants
+# Cleared messages each thread keeps for reuse
+DEFAULT_POOL_SIZE = 16
+
+# MARK: Classes definitions
+# ********************************** AllocationCounters **********************************
+class AllocationCounters(object):
+    # One instance per thread, so counting never takes a lock; readers sum them all
+    __slots__ = ("messagesCreated", "messagesReused", "messagesDiscarded", "framesWritten", "writeCalls")
+
+    # MARK: Constructor
+    def __init__(self):
+        self.messagesCreated = 0
+        self.messagesReused = 0
+        self.messagesDiscarded = 0
+        self.framesWritten = 0
+        self.writeCalls = 0
+# ********************************** AllocationCounters **********************************
+
+# ********************************** MessagePool **********************************
+class MessagePool(object):
+    # MARK: Constructor
+    def __init__(self, size=DEFAULT_POOL_SIZE):
+        self.size = size
+        self.local = threading.local()
+
+    # MARK: Methods
+    def acquire(self):
+        freeMessages = self.freeMessages()
+        counters = threadCounters()
+        if freeMessages:
+            counters.messagesReused += 1
+            return freeMessages.pop()
+        counters.messagesCreated += 1
+        return message_pb2.Message()
+
+    def release(self, message):
+        # The message must not be used by the caller anymore
+        message.Clear()
+        freeMessages = self.freeMessages()
+        if len(freeMessages) < self.size:
+            freeMessages.append(message)
+        else:
+            threadCounters().messagesDiscarded += 1
+
+    def freeMessages(self):
+        try:
+            return self.local.freeMessages
+        except AttributeError:
+            self.local.freeMessages = []
+            return self.local.freeMessages
+# ********************************** MessagePool **********************************
+
+# MARK: Functions
+countersLock = threading.Lock()
+allThreadCounters = []
+localCounters = threading.local()
+
+def threadCounters():
+    try:
+        return localCounters.counters
+    except AttributeError:
+        counters = localCounters.counters = AllocationCounters()
+        with countersLock:
+            allThreadCounters.append(counters)
+        return counters
+
+def getAllocationCounters():
+    with countersLock:
+        everyThread = list(allThreadCounters)
+    return dict((name, sum(getattr(counters, name) for counters in everyThread)) for name in AllocationCounters.__slots__)
+
+def serializeSender(ip, port, sensorId=None, sensorType=None):
+    # Serialized sender field (number 3) of Message. Senders rarely change, so they are serialized
+    # once and appended to every message instead of being built as a nested message each time.
+    message = message_pb2.Message()
+    message.sender.ip = ip
+    message.sender.port = port
+    if sensorId is not None:
+        message.sender.sensor_id = sensorId
+    if sensorType is not None:
+        message.sender.sensor_type = sensorType
+    return message.SerializePartialToString()
@@ -1,12 +1,10 @@
 # -*- coding: utf-8 -*-
 # Generated by the protocol buffer compiler.  DO NOT EDIT!
 # source: message.proto
-
-import sys
-_b=sys.version_info[0]<3 and (lambda x:x) or (lambda x:x.encode('latin1'))
+"""Generated protocol buffer code."""
+from google.protobuf.internal import builder as _builder
 from google.protobuf import descriptor as _descriptor
-from google.protobuf import message as _message
-from google.protobuf import reflection as _reflection
+from google.protobuf import descriptor_pool as _descriptor_pool
 from google.protobuf import symbol_database as _symbol_database
 # @@protoc_insertion_point(imports)
 
@@ -15,275 +13,52 @@ _sym_db = _symbol_database.Default()
 
 
 
-DESCRIPTOR = _descriptor.FileDescriptor(
-  name='message.proto',
-  package='distribuidos',
-  syntax='proto2',
-  serialized_options=_b('\n\'com.mateusmelonascimento.socketprotobufB\007Message'),
-  serialized_pb=_b('\n\rmessage.proto\x12\x0c\x64istribuidos\"\xb9\x05\n\x07Message\x12(\n\x04\x62ody\x18\x01 \x02(\x0b\x32\x1a.distribuidos.Message.Body\x12\x38\n\x04type\x18\x02 \x02(\x0e\x32!.distribuidos.Message.MessageType:\x07\x44\x45\x46\x41ULT\x12,\n\x06sender\x18\x03 \x01(\x0b\x32\x1c.distribuidos.Message.Sender\x1aI\n\x04\x42ody\x12\x13\n\x0b\x64\x65scription\x18\x01 \x02(\t\x12,\n\x06object\x18\x02 \x01(\x0b\x32\x1c.distribuidos.Message.Object\x1a\"\n\x06Sender\x12\n\n\x02ip\x18\x01 \x01(\t\x12\x0c\n\x04port\x18\x02 \x01(\x05\x1a\x08\n\x06Object\"\xa2\x03\n\x0bMessageType\x12 \n\x1c\x43HANGE_SENSOR_STATUS_REQUEST\x10\x01\x12!\n\x1d\x43HANGE_SENSOR_STATUS_RESPONSE\x10\x02\x12\x1c\n\x18READ_SENSOR_DATA_REQUEST\x10\x03\x12\x1d\n\x19READ_SENSOR_DATA_RESPONSE\x10\x04\x12\x1b\n\x17MULTICAST_SENSOR_FINDER\x10\x05\x12\x1f\n\x1bMULTICAST_SENSOR_FINDER_ACK\x10\x06\x12\x1b\n\x17MULTICAST_SERVER_FINDER\x10\x07\x12\x1f\n\x1bMULTICAST_SERVER_FINDER_ACK\x10\x08\x12\x12\n\x0eUPTIME_REQUEST\x10\t\x12\x13\n\x0fUPTIME_RESPONSE\x10\n\x12\x12\n\x0eREQNUM_REQUEST\x10\x0b\x12\x13\n\x0fREQNUM_RESPONSE\x10\x0c\x12\x1c\n\x18\x43LOSE_CONNECTION_REQUEST\x10\r\x12\x18\n\x14\x43LOSE_CONNECTION_ACK\x10\x0e\x12\x0b\n\x07\x44\x45\x46\x41ULT\x10\x0f\x42\x32\n\'com.mateusmelonascimento.socketprotobufB\x07Message')
-)
-
-
-
-_MESSAGE_MESSAGETYPE = _descriptor.EnumDescriptor(
-  name='MessageType',
-  full_name='distribuidos.Message.MessageType',
-  filename=None,
-  file=DESCRIPTOR,
-  values=[
-    _descriptor.EnumValueDescriptor(
-      name='CHANGE_SENSOR_STATUS_REQUEST', index=0, number=1,
-      serialized_options=None,
-      type=None),
-    _descriptor.EnumValueDescriptor(
-      name='CHANGE_SENSOR_STATUS_RESPONSE', index=1, number=2,
-      serialized_options=None,
-      type=None),
-    _descriptor.EnumValueDescriptor(
-      name='READ_SENSOR_DATA_REQUEST', index=2, number=3,
-      serialized_options=None,
-      type=None),
-    _descriptor.EnumValueDescriptor(
-      name='READ_SENSOR_DATA_RESPONSE', index=3, number=4,
-      serialized_options=None,
-      type=None),
-    _descriptor.EnumValueDescriptor(
-      name='MULTICAST_SENSOR_FINDER', index=4, number=5,
-      serialized_options=None,
-      type=None),
-    _descriptor.EnumValueDescriptor(
-      name='MULTICAST_SENSOR_FINDER_ACK', index=5, number=6,
-      serialized_options=None,
-      type=None),
-    _descriptor.EnumValueDescriptor(
-      name='MULTICAST_SERVER_FINDER', index=6, number=7,
-      serialized_options=None,
-      type=None),
-    _descriptor.EnumValueDescriptor(
-      name='MULTICAST_SERVER_FINDER_ACK', index=7, number=8,
-      serialized_options=None,
-      type=None),
-    _descriptor.EnumValueDescriptor(
-      name='UPTIME_REQUEST', index=8, number=9,
-      serialized_options=None,
-      type=None),
-    _descriptor.EnumValueDescriptor(
-      name='UPTIME_RESPONSE', index=9, number=10,
-      serialized_options=None,
-      type=None),
-    _descriptor.EnumValueDescriptor(
-      name='REQNUM_REQUEST', index=10, number=11,
-      serialized_options=None,
-      type=None),
-    _descriptor.EnumValueDescriptor(
-      name='REQNUM_RESPONSE', index=11, number=12,
-      serialized_options=None,
-      type=None),
-    _descriptor.EnumValueDescriptor(
-      name='CLOSE_CONNECTION_REQUEST', index=12, number=13,
-      serialized_options=None,
-      type=None),
-    _descriptor.EnumValueDescriptor(
-      name='CLOSE_CONNECTION_ACK', index=13, number=14,
-      serialized_options=None,
-      type=None),
-    _descriptor.EnumValueDescriptor(
-      name='DEFAULT', index=14, number=15,
-      serialized_options=None,
-      type=None),
-  ],
-  containing_type=None,
-  serialized_options=None,
-  serialized_start=311,
-  serialized_end=729,
-)
-_sym_db.RegisterEnumDescriptor(_MESSAGE_MESSAGETYPE)
-
-
-_MESSAGE_BODY = _descriptor.Descriptor(
-  name='Body',
-  full_name='distribuidos.Message.Body',
-  filename=None,
-  file=DESCRIPTOR,
-  containing_type=None,
-  fields=[
-    _descriptor.FieldDescriptor(
-      name='description', full_name='distribuidos.Message.Body.description', index=0,
-      number=1, type=9, cpp_type=9, label=2,
-      has_default_value=False, default_value=_b("").decode('utf-8'),
-      message_type=None, enum_type=None, containing_type=None,
-      is_extension=False, extension_scope=None,
-      serialized_options=None, file=DESCRIPTOR),
-    _descriptor.FieldDescriptor(
-      name='object', full_name='distribuidos.Message.Body.object', index=1,
-      number=2, type=11, cpp_type=10, label=1,
-      has_default_value=False, default_value=None,
-      message_type=None, enum_type=None, containing_type=None,
-      is_extension=False, extension_scope=None,
-      serialized_options=None, file=DESCRIPTOR),
-  ],
-  extensions=[
-  ],
-  nested_types=[],
-  enum_types=[
-  ],
-  serialized_options=None,
-  is_extendable=False,
-  syntax='proto2',
-  extension_ranges=[],
-  oneofs=[
-  ],
-  serialized_start=189,
-  serialized_end=262,
-)
-
-_MESSAGE_SENDER = _descriptor.Descriptor(
-  name='Sender',
-  full_name='distribuidos.Message.Sender',
-  filename=None,
-  file=DESCRIPTOR,
-  containing_type=None,
-  fields=[
-    _descriptor.FieldDescriptor(
-      name='ip', full_name='distribuidos.Message.Sender.ip', index=0,
-      number=1, type=9, cpp_type=9, label=1,
-      has_default_value=False, default_value=_b("").decode('utf-8'),
-      message_type=None, enum_type=None, containing_type=None,
-      is_extension=False, extension_scope=None,
-      serialized_options=None, file=DESCRIPTOR),
-    _descriptor.FieldDescriptor(
-      name='port', full_name='distribuidos.Message.Sender.port', index=1,
-      number=2, type=5, cpp_type=1, label=1,
-      has_default_value=False, default_value=0,
-      message_type=None, enum_type=None, containing_type=None,
-      is_extension=False, extension_scope=None,
-      serialized_options=None, file=DESCRIPTOR),
-  ],
-  extensions=[
-  ],
-  nested_types=[],
-  enum_types=[
-  ],
-  serialized_options=None,
-  is_extendable=False,
-  syntax='proto2',
-  extension_ranges=[],
-  oneofs=[
-  ],
-  serialized_start=264,
-  serialized_end=298,
-)
-
-_MESSAGE_OBJECT = _descriptor.Descriptor(
-  name='Object',
-  full_name='distribuidos.Message.Object',
-  filename=None,
-  file=DESCRIPTOR,
-  containing_type=None,
-  fields=[
-  ],
-  extensions=[
-  ],
-  nested_types=[],
-  enum_types=[
-  ],
-  serialized_options=None,
-  is_extendable=False,
-  syntax='proto2',
-  extension_ranges=[],
-  oneofs=[
-  ],
-  serialized_start=300,
-  serialized_end=308,
-)
-
-_MESSAGE = _descriptor.Descriptor(
-  name='Message',
-  full_name='distribuidos.Message',
-  filename=None,
-  file=DESCRIPTOR,
-  containing_type=None,
-  fields=[
-    _descriptor.FieldDescriptor(
-      name='body', full_name='distribuidos.Message.body', index=0,
-      number=1, type=11, cpp_type=10, label=2,
-      has_default_value=False, default_value=None,
-      message_type=None, enum_type=None, containing_type=None,
-      is_extension=False, extension_scope=None,
-      serialized_options=None, file=DESCRIPTOR),
-    _descriptor.FieldDescriptor(
-      name='type', full_name='distribuidos.Message.type', index=1,
-      number=2, type=14, cpp_type=8, label=2,
-      has_default_value=True, default_value=15,
-      message_type=None, enum_type=None, containing_type=None,
-      is_extension=False, extension_scope=None,
-      serialized_options=None, file=DESCRIPTOR),
-    _descriptor.FieldDescriptor(
-      name='sender', full_name='distribuidos.Message.sender', index=2,
-      number=3, type=11, cpp_type=10, label=1,
-      has_default_value=False, default_value=None,
-      message_type=None, enum_type=None, containing_type=None,
-      is_extension=False, extension_scope=None,
-      serialized_options=None, file=DESCRIPTOR),
-  ],
-  extensions=[
-  ],
-  nested_types=[_MESSAGE_BODY, _MESSAGE_SENDER, _MESSAGE_OBJECT, ],
-  enum_types=[
-    _MESSAGE_MESSAGETYPE,
-  ],
-  serialized_options=None,
-  is_extendable=False,
-  syntax='proto2',
-  extension_ranges=[],
-  oneofs=[
-  ],
-  serialized_start=32,
-  serialized_end=729,
-)
-
-_MESSAGE_BODY.fields_by_name['object'].message_type = _MESSAGE_OBJECT
-_MESSAGE_BODY.containing_type = _MESSAGE
-_MESSAGE_SENDER.containing_type = _MESSAGE
-_MESSAGE_OBJECT.containing_type = _MESSAGE
-_MESSAGE.fields_by_name['body'].message_type = _MESSAGE_BODY
-_MESSAGE.fields_by_name['type'].enum_type = _MESSAGE_MESSAGETYPE
-_MESSAGE.fields_by_name['sender'].message_type = _MESSAGE_SENDER
-_MESSAGE_MESSAGETYPE.containing_type = _MESSAGE
-DESCRIPTOR.message_types_by_name['Message'] = _MESSAGE
-_sym_db.RegisterFileDescriptor(DESCRIPTOR)
-
-Message = _reflection.GeneratedProtocolMessageType('Message', (_message.Message,), {
-
-  'Body' : _reflection.GeneratedProtocolMessageType('Body', (_message.Message,), {
-    'DESCRIPTOR' : _MESSAGE_BODY,
-    '__module__' : 'message_pb2'
-    # @@protoc_insertion_point(class_scope:distribuidos.Message.Body)
-    })
-  ,
-
-  'Sender' : _reflection.GeneratedProtocolMessageType('Sender', (_message.Message,), {
-    'DESCRIPTOR' : _MESSAGE_SENDER,
-    '__module__' : 'message_pb2'
-    # @@protoc_insertion_point(class_scope:distribuidos.Message.Sender)
-    })
-  ,
-
-  'Object' : _reflection.GeneratedProtocolMessageType('Object', (_message.Message,), {
-    'DESCRIPTOR' : _MESSAGE_OBJECT,
-    '__module__' : 'message_pb2'
-    # @@protoc_insertion_point(class_scope:distribuidos.Message.Object)
-    })
-  ,
-  'DESCRIPTOR' : _MESSAGE,
-  '__module__' : 'message_pb2'
-  # @@protoc_insertion_point(class_scope:distribuidos.Message)
-  })
-_sym_db.RegisterMessage(Message)
-_sym_db.RegisterMessage(Message.Body)
-_sym_db.RegisterMessage(Message.Sender)
-_sym_db.RegisterMessage(Message.Object)
-
-
-DESCRIPTOR._options = None
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\rmessage.proto\x12\nconnection\"\xe3\x0c\n\x07Message\x12&\n\x04\x62ody\x18\x01 \x02(\x0b\x32\x18.connection.Message.Body\x12\x36\n\x04type\x18\x02 \x02(\x0e\x32\x1f.connection.Message.MessageType:\x07\x44\x45\x46\x41ULT\x12*\n\x06sender\x18\x03 \x01(\x0b\x32\x1a.connection.Message.Sender\x12\x12\n\nrequest_id\x18\x04 \x01(\r\x12\'\n\x05\x62\x61tch\x18\x05 \x01(\x0b\x32\x18.connection.MessageBatch\x12\x11\n\ttarget_id\x18\x06 \x01(\t\x12&\n\x05stats\x18\x07 \x01(\x0b\x32\x17.connection.ServerStats\x12\x17\n\x0freply_window_ms\x18\x08 \x01(\r\x12\x37\n\tread_mode\x18\t \x01(\x0e\x32\x1c.connection.Message.ReadMode:\x06STORED\x12\x10\n\x08since_ms\x18\n \x01(\x04\x12\x10\n\x08until_ms\x18\x0b \x01(\x04\x1aG\n\x04\x42ody\x12\x13\n\x0b\x64\x65scription\x18\x01 \x02(\t\x12*\n\x06object\x18\x02 \x01(\x0b\x32\x1a.connection.Message.Object\x1aJ\n\x06Sender\x12\n\n\x02ip\x18\x01 \x01(\t\x12\x0c\n\x04port\x18\x02 \x01(\x05\x12\x11\n\tsensor_id\x18\x03 \x01(\t\x12\x13\n\x0bsensor_type\x18\x04 \x01(\t\x1a\xa1\x04\n\x06Object\x12\x32\n\x04lamp\x18\x01 \x01(\x0b\x32$.connection.Message.Object.LampState\x12\x33\n\x04\x62owl\x18\x02 \x01(\x0b\x32%.connection.Message.Object.BowlWeight\x12\x36\n\x06\x63ollar\x18\x03 \x01(\x0b\x32&.connection.Message.Object.CollarTrack\x1a\x1a\n\tLampState\x12\r\n\x05is_on\x18\x01 \x01(\x08\x1a[\n\nBowlWeight\x12\x19\n\x11\x62\x61se_timestamp_ms\x18\x01 \x01(\x04\x12\x1f\n\x13timestamp_deltas_ms\x18\x02 \x03(\rB\x02\x10\x01\x12\x11\n\x05grams\x18\x03 \x03(\rB\x02\x10\x01\x1a\xfc\x01\n\x0b\x43ollarTrack\x12\x13\n\x0bis_tracking\x18\x01 \x01(\x08\x12\x19\n\x11\x62\x61se_timestamp_ms\x18\x02 \x01(\x04\x12\x1f\n\x13timestamp_deltas_ms\x18\x03 \x03(\rB\x02\x10\x01\x12\x1e\n\x12latitude_deltas_e7\x18\x04 \x03(\x11\x42\x02\x10\x01\x12\x1f\n\x13longitude_deltas_e7\x18\x05 \x03(\x11\x42\x02\x10\x01\x12\x1d\n\x11\x61\x63\x63\x65leration_x_mg\x18\x06 \x03(\x11\x42\x02\x10\x01\x12\x1d\n\x11\x61\x63\x63\x65leration_y_mg\x18\x07 \x03(\x11\x42\x02\x10\x01\x12\x1d\n\x11\x61\x63\x63\x65leration_z_mg\x18\x08 \x03(\x11\x42\x02\x10\x01\"\xeb\x03\n\x0bMessageType\x12 \n\x1c\x43HANGE_SENSOR_STATUS_REQUEST\x10\x01\x12!\n\x1d\x43HANGE_SENSOR_STATUS_RESPONSE\x10\x02\x12\x1c\n\x18READ_SENSOR_DATA_REQUEST\x10\x03\x12\x1d\n\x19READ_SENSOR_DATA_RESPONSE\x10\x04\x12\x1b\n\x17MULTICAST_SENSOR_FINDER\x10\x05\x12\x1f\n\x1bMULTICAST_SENSOR_FINDER_ACK\x10\x06\x12\x1b\n\x17MULTICAST_SERVER_FINDER\x10\x07\x12\x1f\n\x1bMULTICAST_SERVER_FINDER_ACK\x10\x08\x12\x12\n\x0eUPTIME_REQUEST\x10\t\x12\x13\n\x0fUPTIME_RESPONSE\x10\n\x12\x12\n\x0eREQNUM_REQUEST\x10\x0b\x12\x13\n\x0fREQNUM_RESPONSE\x10\x0c\x12\x1c\n\x18\x43LOSE_CONNECTION_REQUEST\x10\r\x12\x18\n\x14\x43LOSE_CONNECTION_ACK\x10\x0e\x12\x0b\n\x07\x44\x45\x46\x41ULT\x10\x0f\x12\x11\n\rBATCH_REQUEST\x10\x10\x12\r\n\tBATCH_ACK\x10\x11\x12\x11\n\rSTATS_REQUEST\x10\x12\x12\x12\n\x0eSTATS_RESPONSE\x10\x13\"7\n\x08ReadMode\x12\n\n\x06STORED\x10\x00\x12\n\n\x06ROLLUP\x10\x01\x12\x08\n\x04LIVE\x10\x02\x12\t\n\x05RANGE\x10\x03\"a\n\x0cMessageBatch\x12*\n\x06sender\x18\x01 \x01(\x0b\x32\x1a.connection.Message.Sender\x12%\n\x08messages\x18\x02 \x03(\x0b\x32\x13.connection.Message\"\xcb\x02\n\x0bServerStats\x12\x10\n\x08requests\x18\x01 \x01(\x04\x12\x10\n\x08\x62ytes_in\x18\x02 \x01(\x04\x12\x11\n\tbytes_out\x18\x03 \x01(\x04\x12\x1a\n\x12\x61\x63tive_connections\x18\x04 \x01(\x04\x12\x0e\n\x06\x65rrors\x18\x05 \x01(\x04\x12\x32\n\tlatencies\x18\x06 \x03(\x0b\x32\x1f.connection.ServerStats.Latency\x1a\xa4\x01\n\x07Latency\x12-\n\x04type\x18\x01 \x01(\x0e\x32\x1f.connection.Message.MessageType\x12\r\n\x05\x63ount\x18\x02 \x01(\x04\x12\x0c\n\x04mean\x18\x03 \x01(\x01\x12\x0b\n\x03min\x18\x04 \x01(\x04\x12\x0b\n\x03p50\x18\x05 \x01(\x04\x12\x0b\n\x03p90\x18\x06 \x01(\x04\x12\x0b\n\x03p99\x18\x07 \x01(\x04\x12\x0c\n\x04p999\x18\x08 \x01(\x04\x12\x0b\n\x03max\x18\t \x01(\x04\x42;\n+br.gov.ce.sspds.voicerecognition.connectionB\x0cMessageProto')
+
+_builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, globals())
+_builder.BuildTopDescriptorsAndMessages(DESCRIPTOR, 'message_pb2', globals())
+if _descriptor._USE_C_DESCRIPTORS == False:
+
+  DESCRIPTOR._options = None
+  DESCRIPTOR._serialized_options = b'\n+br.gov.ce.sspds.voicerecognition.connectionB\014MessageProto'
+  _MESSAGE_OBJECT_BOWLWEIGHT.fields_by_name['timestamp_deltas_ms']._options = None
+  _MESSAGE_OBJECT_BOWLWEIGHT.fields_by_name['timestamp_deltas_ms']._serialized_options = b'\020\001'
+  _MESSAGE_OBJECT_BOWLWEIGHT.fields_by_name['grams']._options = None
+  _MESSAGE_OBJECT_BOWLWEIGHT.fields_by_name['grams']._serialized_options = b'\020\001'
+  _MESSAGE_OBJECT_COLLARTRACK.fields_by_name['timestamp_deltas_ms']._options = None
+  _MESSAGE_OBJECT_COLLARTRACK.fields_by_name['timestamp_deltas_ms']._serialized_options = b'\020\001'
+  _MESSAGE_OBJECT_COLLARTRACK.fields_by_name['latitude_deltas_e7']._options = None
+  _MESSAGE_OBJECT_COLLARTRACK.fields_by_name['latitude_deltas_e7']._serialized_options = b'\020\001'
+  _MESSAGE_OBJECT_COLLARTRACK.fields_by_name['longitude_deltas_e7']._options = None
+  _MESSAGE_OBJECT_COLLARTRACK.fields_by_name['longitude_deltas_e7']._serialized_options = b'\020\001'
+  _MESSAGE_OBJECT_COLLARTRACK.fields_by_name['acceleration_x_mg']._options = None
+  _MESSAGE_OBJECT_COLLARTRACK.fields_by_name['acceleration_x_mg']._serialized_options = b'\020\001'
+  _MESSAGE_OBJECT_COLLARTRACK.fields_by_name['acceleration_y_mg']._options = None
+  _MESSAGE_OBJECT_COLLARTRACK.fields_by_name['acceleration_y_mg']._serialized_options = b'\020\001'
+  _MESSAGE_OBJECT_COLLARTRACK.fields_by_name['acceleration_z_mg']._options = None
+  _MESSAGE_OBJECT_COLLARTRACK.fields_by_name['acceleration_z_mg']._serialized_options = b'\020\001'
+  _MESSAGE._serialized_start=30
+  _MESSAGE._serialized_end=1665
+  _MESSAGE_BODY._serialized_start=419
+  _MESSAGE_BODY._serialized_end=490
+  _MESSAGE_SENDER._serialized_start=492
+  _MESSAGE_SENDER._serialized_end=566
+  _MESSAGE_OBJECT._serialized_start=569
+  _MESSAGE_OBJECT._serialized_end=1114
+  _MESSAGE_OBJECT_LAMPSTATE._serialized_start=740
+  _MESSAGE_OBJECT_LAMPSTATE._serialized_end=766
+  _MESSAGE_OBJECT_BOWLWEIGHT._serialized_start=768
+  _MESSAGE_OBJECT_BOWLWEIGHT._serialized_end=859
+  _MESSAGE_OBJECT_COLLARTRACK._serialized_start=862
+  _MESSAGE_OBJECT_COLLARTRACK._serialized_end=1114
+  _MESSAGE_MESSAGETYPE._serialized_start=1117
+  _MESSAGE_MESSAGETYPE._serialized_end=1608
+  _MESSAGE_READMODE._serialized_start=1610
+  _MESSAGE_READMODE._serialized_end=1665
+  _MESSAGEBATCH._serialized_start=1667
+  _MESSAGEBATCH._serialized_end=1764
+  _SERVERSTATS._serialized_start=1767
+  _SERVERSTATS._serialized_end=2098
+  _SERVERSTATS_LATENCY._serialized_start=1934
+  _SERVERSTATS_LATENCY._serialized_end=2098
 # @@protoc_insertion_point(module_scope)
@@ -0,0 +1,48 @@
+import threading
+
+from http.server import BaseHTTPRequestHandler
+from http.server import HTTPServer
+
+from serverStats import getServerStats
+from serverStats import prometheusText
+
+# MARK: Constants
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# MARK: Classes definitions
+# ********************************** MetricsServer **********************************
+class MetricsServer(object):
+    # Serves the server stats on GET /metrics, for Prometheus to scrape
+    # MARK: Constructor
+    def __init__(self, ip, port, stats=None):
+        self.ip = ip
+        self.port = port
+        self.stats = stats or getServerStats()
+
+    # MARK: Methods
+    def start(self):
+        stats = self.stats
+
+        class MetricsRequestHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = prometheusText(stats.snapshot()).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", PROMETHEUS_CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                # Scrapes every few seconds would flood the server's output
+                pass
+
+        httpServer = HTTPServer((self.ip, self.port), MetricsRequestHandler)
+        thread = threading.Thread(target = httpServer.serve_forever)
+        thread.daemon = True
+        thread.start()
+        print("Metrics are up on http://%s:%s/metrics"%(self.ip or "0.0.0.0", self.port))
+        return httpServer
+# ********************************** MetricsServer **********************************
@@ -0,0 +1,223 @@
+import errno
+import heapq
+import itertools
+import random
+import select
+import socket
+import threading
+import sys
+import struct
+import time
+
+from requestContext import parseRequest
+from serverStats import getServerStats
+from asyncLogger import DEBUG
+from asyncLogger import getLogger
+from myconfig import BUFFSIZE
+
+# Optional settings, myconfig.py may leave them out
+try:
+    from myconfig import MULTICAST_RCVBUF
+except ImportError:
+    # Bytes the kernel may queue for a UDP socket, the default ~200KB overflows when thousands of
+    # sensors answer a probe at once. Capped by net.core.rmem_max.
+    MULTICAST_RCVBUF = 4 * 1024 * 1024
+try:
+    from myconfig import MULTICAST_SOURCE_RATE
+except ImportError:
+    # Datagrams per second accepted from a single source address, None for no limit
+    MULTICAST_SOURCE_RATE = 100
+
+# MARK: Constants
+log = getLogger("multicastReceiver")
+# Per-message records, sampled
+requestLog = getLogger("requests", sampled=True)
+# Sources tracked by a rate limiter before idle ones are forgotten
+MAX_TRACKED_SOURCES = 10000
+# Datagrams read per wakeup at most, before they are handled together
+MAX_DRAINED_DATAGRAMS = 256
+# Errors of a non-blocking socket with nothing to read, or no room to write
+WOULD_BLOCK = (errno.EAGAIN, errno.EWOULDBLOCK)
+
+# MARK: Classes definitions
+# ********************************** SourceRateLimiter **********************************
+class SourceRateLimiter(object):
+    # Token bucket per source address: rate datagrams per second, up to burst at once
+    # MARK: Constructor
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.burst = float(burst or 2 * rate)
+        # Source address -> [tokens left, time they were counted]
+        self.buckets = {}
+
+    # MARK: Methods
+    def allow(self, source, now=None):
+        now = time.time() if now is None else now
+        bucket = self.buckets.get(source)
+        if bucket is None:
+            if len(self.buckets) >= MAX_TRACKED_SOURCES:
+                self.forgetIdleSources(now)
+            bucket = self.buckets[source] = [self.burst, now]
+        else:
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+        if bucket[0] < 1:
+            return False
+        bucket[0] -= 1
+        return True
+
+    def forgetIdleSources(self, now):
+        # A source idle long enough to have a full bucket again is the same as a new one
+        refillTime = self.burst / self.rate
+        self.buckets = dict((source, bucket) for source, bucket in self.buckets.items() if now - bucket[1] < refillTime)
+# ********************************** SourceRateLimiter **********************************
+
+# ********************************** MulticastReceiver **********************************
+class MulticastReceiver(object):
+    # MARK: Constructor
+    def __init__(self, ip, port, ip_group, handler, name="Multicast Server", sourceRate=MULTICAST_SOURCE_RATE):
+        self.ip = ip
+        self.port = port
+        self.ip_group = ip_group
+        # Called as handler(context) with the RequestContext of every datagram, returns (stayInTouch, response),
+        # response may be None for no reply or a list of datagrams to send back
+        self.handler = handler
+        self.name = name
+        self.stats = getServerStats()
+        # Drops datagrams of sources sending faster than sourceRate per second
+        self.rateLimiter = SourceRateLimiter(sourceRate) if sourceRate else None
+        # (send at, sequence, datagram, address) of replies held back by a probe's reply_window_ms
+        self.delayedReplies = []
+        self.replySequence = itertools.count()
+        # One BUFFSIZE slot per datagram of a drain, received into without allocating. Contexts point
+        # into it and are only valid until the next drain, like the TCP engines' frames.
+        self.receiveBuffer = bytearray(MAX_DRAINED_DATAGRAMS * BUFFSIZE)
+        self.receiveSlots = [memoryview(self.receiveBuffer)[slot * BUFFSIZE:(slot + 1) * BUFFSIZE] for slot in range(MAX_DRAINED_DATAGRAMS)]
+
+        try:
+            self.serverSocket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            # [Errno 98] Address already in use
+            # the SO_REUSEADDR flag tells the kernel to reuse a local socket in TIME_WAIT state, 
+            # without waiting for its natural timeout to expire.
+            self.serverSocket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            setReceiveBuffer(self.serverSocket)
+        except socket.error as e:
+            print("Failed to create socket: %s"%(e))
+            sys.exit()
+
+        try:
+            # Bind to the server address
+            self.serverSocket.bind((self.ip, self.port))
+            # Server's up
+            print("%s is up and ready to receive connections in UDP MODE! IP '%s' and PORT '%s'"%(self.name, self.ip, self.port))
+        except socket.error as e:
+            print("Failed to bind: %s"%(e))
+            sys.exit()
+
+        # Tell the operating system to add the socket to the multicast group
+        # on all interfaces.
+        group = socket.inet_aton(ip_group)
+        mreq = struct.pack('4sL', group, socket.INADDR_ANY)
+        self.serverSocket.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, mreq)
+
+    # MARK: Methods
+    def waitForFinderSignal(self):
+        threading.Thread(target = self.handleMulticastUDPMessages).start()
+
+    def handleMulticastUDPMessages(self):
+        # One wakeup per burst rather than per datagram: wait until the socket is readable,
+        # read everything queued without blocking, then handle it all
+        self.serverSocket.setblocking(False)
+        while True:
+            # Wait for the next datagram, or until the next delayed reply is due
+            readable, _, _ = select.select([self.serverSocket], [], [], self.sendDueReplies())
+            if readable:
+                self.handleDatagrams(self.drain())
+
+    def drain(self):
+        # [(datagram view, client address)] of every datagram queued, up to MAX_DRAINED_DATAGRAMS
+        datagrams = []
+        for slot in self.receiveSlots:
+            try:
+                size, clientAddress = self.serverSocket.recvfrom_into(slot)
+            except socket.error as e:
+                if e.errno in WOULD_BLOCK:
+                    break
+                raise
+            if size:
+                datagrams.append((slot[:size], clientAddress))
+        return datagrams
+
+    def handleDatagrams(self, datagrams):
+        self.stats.recordBytesIn(sum(len(datagram) for datagram, _ in datagrams))
+        for messageFromClient, clientAddress in datagrams:
+            if self.rateLimiter is not None and not self.rateLimiter.allow(clientAddress):
+                # Sampled, a flooding source would flood the log as well
+                requestLog.info("Dropping datagram from %s:%s, over %s per second", clientAddress[0], clientAddress[1], self.rateLimiter.rate)
+                self.stats.recordError()
+                continue
+            # Parsed once, here, for logging and dispatch alike
+            try:
+                context = parseRequest(messageFromClient, clientAddress)
+            except Exception as e:
+                # Anybody can send to the group, a broken datagram must not stop the receiver
+                log.warning("Dropping datagram from IP %s: %s", clientAddress[0], e)
+                self.stats.recordError()
+                continue
+            requestLog.info("MESSAGE FROM IP %s: type %s, %s bytes", clientAddress[0], context.message.type, len(messageFromClient))
+            if requestLog.isEnabledFor(DEBUG):
+                requestLog.debug("MESSAGE FROM IP %s: %s", clientAddress[0], context.message)
+
+            # Handle the message according to received signal and send a response to client
+            stayInTouch, response = self.handler(context)
+
+            # Reply client
+            if response is None:
+                continue
+            if not isinstance(response, list):
+                response = [response]
+            if context.message.reply_window_ms:
+                # Every receiver of a multicast probe answers at once, so replies are spread at random
+                # over the window the prober asked for instead of reaching it in a single burst
+                replyWindow = context.message.reply_window_ms / 1000.0
+                for datagram in response:
+                    heapq.heappush(self.delayedReplies, (context.receivedAt + random.uniform(0, replyWindow), next(self.replySequence), datagram, clientAddress))
+            else:
+                for datagram in response:
+                    self.reply(datagram, clientAddress)
+
+    def sendDueReplies(self):
+        # Send the delayed replies that are due, returns the seconds until the next one or None
+        while self.delayedReplies:
+            timeout = self.delayedReplies[0][0] - time.time()
+            if timeout > 0:
+                return timeout
+            _, _, datagram, clientAddress = heapq.heappop(self.delayedReplies)
+            self.reply(datagram, clientAddress)
+        return None
+
+    def reply(self, datagram, clientAddress):
+        try:
+            while True:
+                try:
+                    self.serverSocket.sendto(datagram, clientAddress)
+                    break
+                except socket.error as e:
+                    if e.errno not in WOULD_BLOCK:
+                        raise
+                # The send buffer is full after a burst of replies, wait for room instead of dropping this one
+                select.select([], [self.serverSocket], [], 1.0)
+        except socket.error as e:
+            log.warning("Failed to reply to %s:%s: %s", clientAddress[0], clientAddress[1], e)
+            self.stats.recordError()
+            return
+        self.stats.recordBytesOut(len(datagram))
+# ********************************** MulticastReceiver **********************************
+
+# MARK: Functions
+def setReceiveBuffer(udpSocket, size=MULTICAST_RCVBUF):
+    # Ask for a larger receive buffer, the kernel silently caps it at net.core.rmem_max
+    try:
+        udpSocket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, size)
+    except socket.error as e:
+        log.warning("Failed to set SO_RCVBUF to %s: %s", size, e)
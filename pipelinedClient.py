@@ -0,0 +1,79 @@
+import message_pb2
+
+from framing import FrameBuffer
+from framing import encodeFrame
+from myconfig import BUFFSIZE
+
+# MARK: Constants
+# Requests sent but not answered yet, sending more waits for responses first
+DEFAULT_MAX_IN_FLIGHT = 128
+# request_id is a uint32 and 0 means "not set"
+MAX_REQUEST_ID = 0xFFFFFFFF
+
+# MARK: Classes definitions
+# ********************************** PipelinedConnection **********************************
+class PipelinedConnection(object):
+    # MARK: Constructor
+    def __init__(self, connection, maxInFlight=DEFAULT_MAX_IN_FLIGHT):
+        # A connected TCP socket to the server
+        self.connection = connection
+        self.maxInFlight = maxInFlight
+        self.frameBuffer = FrameBuffer()
+        self.nextRequestId = 1
+        self.inFlight = set()
+        # Responses that arrived before anyone asked for them, by request id
+        self.responses = {}
+
+    # MARK: Methods
+    def send(self, message):
+        return self.sendMany([message])[0]
+
+    def sendMany(self, messages):
+        # Stamp every message with a fresh request id and write them all in a single call
+        requestIds = []
+        frames = []
+        for message in messages:
+            while len(self.inFlight) + len(frames) >= self.maxInFlight:
+                # Window is full, flush what we have and wait for some answers
+                self.flush(frames)
+                frames = []
+                self.readResponses()
+
+            requestId = self.nextRequestId
+            self.nextRequestId = requestId % MAX_REQUEST_ID + 1
+            message.request_id = requestId
+            frames.append(encodeFrame(message.SerializeToString()))
+            requestIds.append(requestId)
+            self.inFlight.add(requestId)
+
+        self.flush(frames)
+        return requestIds
+
+    def flush(self, frames):
+        if frames:
+            self.connection.sendall(b"".join(frames))
+
+    def receive(self, requestId):
+        # Block until the response to requestId arrives, responses to other requests are kept
+        while requestId not in self.responses:
+            self.readResponses()
+        return self.responses.pop(requestId)
+
+    def request(self, messages):
+        # Pipeline all messages and return their responses in the same order, whatever order they came back in
+        return [self.receive(requestId) for requestId in self.sendMany(messages)]
+
+    def readResponses(self):
+        frames = self.frameBuffer.recvFrames(self.connection, BUFFSIZE)
+        if frames is None:
+            raise EOFError("Server closed the connection with %s requests in flight"%(len(self.inFlight)))
+
+        for frame in frames:
+            response = message_pb2.Message()
+            response.ParseFromString(frame)
+            self.inFlight.discard(response.request_id)
+            self.responses[response.request_id] = response
+
+    def close(self):
+        self.connection.close()
+# ********************************** PipelinedConnection **********************************
@@ -0,0 +1,32 @@
+import time
+import message_pb2
+
+# MARK: Classes definitions
+# ********************************** RequestContext **********************************
+class RequestContext(object):
+    # Created once per received frame or datagram and handed to logging, dispatch and metrics,
+    # so no layer parses the same bytes again
+    __slots__ = ("message", "raw", "peer", "receivedAt")
+
+    # MARK: Constructor
+    def __init__(self, message, raw=None, peer=None, receivedAt=None):
+        # Parsed message_pb2.Message
+        self.message = message
+        # Bytes the message was parsed from, None for messages unpacked from a batch. Engines pass a
+        # view of their receive buffer, only valid while the request is being handled: copy it to keep it.
+        self.raw = raw
+        # (ip, port) of the client
+        self.peer = peer
+        self.receivedAt = time.time() if receivedAt is None else receivedAt
+
+    # MARK: Methods
+    def child(self, message):
+        # Context for a message carried inside this one, e.g. an item of a batch
+        return RequestContext(message, None, self.peer, self.receivedAt)
+# ********************************** RequestContext **********************************
+
+# MARK: Functions
+def parseRequest(serialized_message_string, peer=None):
+    message = message_pb2.Message()
+    message.ParseFromString(serialized_message_string)
+    return RequestContext(message, serialized_message_string, peer)
@@ -0,0 +1,193 @@
+import random
+import select
+import socket
+import struct
+import threading
+import time
+
+from framing import FrameBuffer
+from framing import sendFrame
+from asyncLogger import getLogger
+from myconfig import BUFFSIZE
+from myconfig import TIMEOUT
+
+# MARK: Constants
+log = getLogger("sensorClient")
+# Connections kept open to the same server
+DEFAULT_POOL_SIZE = 4
+# Reconnect delays grow from INITIAL_BACKOFF up to MAX_BACKOFF seconds, with full jitter
+# so a fleet of sensors does not reconnect in lock-step after a server restart
+INITIAL_BACKOFF = 0.5
+MAX_BACKOFF = 30.0
+# Connections idle for longer than this are checked before being reused
+HEALTH_CHECK_INTERVAL = 30.0
+# Seconds to wait for a free connection slot before giving up
+ACQUIRE_TIMEOUT = 30.0
+
+# MARK: Classes definitions
+# ********************************** PooledConnection **********************************
+class PooledConnection(object):
+    # MARK: Constructor
+    def __init__(self, connection):
+        self.connection = connection
+        self.frameBuffer = FrameBuffer()
+        self.lastUsed = time.time()
+
+    # MARK: Methods
+    def request(self, serialized_message_string):
+        sendFrame(self.connection, serialized_message_string)
+        response = self.frameBuffer.recvFrame(self.connection, BUFFSIZE)
+        if response is None:
+            raise socket.error("Server closed the connection")
+        self.lastUsed = time.time()
+        return response
+
+    def isHealthy(self):
+        # An idle connection should have nothing to read. If it is readable, the server either
+        # closed it (empty read) or sent something we never asked for; either way drop it.
+        try:
+            readable, _, _ = select.select([self.connection], [], [], 0)
+        except (socket.error, ValueError):
+            return False
+        return not readable
+
+    def close(self):
+        try:
+            self.connection.close()
+        except socket.error:
+            pass
+# ********************************** PooledConnection **********************************
+
+# ********************************** ConnectionPool **********************************
+class ConnectionPool(object):
+    # MARK: Constructor
+    def __init__(self, ip, port, size=DEFAULT_POOL_SIZE, timeout=TIMEOUT, maxAttempts=None, acquireTimeout=ACQUIRE_TIMEOUT):
+        self.ip = ip
+        self.port = port
+        self.timeout = timeout
+        self.acquireTimeout = acquireTimeout
+        # None keeps trying forever, a sensor should outlive any server restart
+        self.maxAttempts = maxAttempts
+        self.idleConnections = []
+        self.lock = threading.Lock()
+        # Limits how many connections are open at once
+        self.slots = threading.BoundedSemaphore(size)
+
+    # MARK: Methods
+    def request(self, serialized_message_string):
+        # Send a message and return the server's response, reconnecting as often as needed
+        attempt = 0
+        while True:
+            connection = self.acquire()
+            try:
+                response = connection.request(serialized_message_string)
+            except socket.error as e:
+                self.release(connection, broken=True)
+                attempt += 1
+                if self.maxAttempts is not None and attempt >= self.maxAttempts:
+                    raise
+                delay = backoffDelay(attempt)
+                log.warning("Request to %s:%s failed: %s. Retrying in %.1fs", self.ip, self.port, e, delay)
+                time.sleep(delay)
+                continue
+            except Exception:
+                # E.g. a ValueError for a frame over the size limit: the stream is unusable, and the slot must
+                # be given back or the pool runs dry
+                self.release(connection, broken=True)
+                raise
+
+            self.release(connection)
+            return response
+
+    def acquire(self):
+        if not self.slots.acquire(timeout = self.acquireTimeout):
+            raise socket.error("No free connection to %s:%s after %ss"%(self.ip, self.port, self.acquireTimeout))
+        try:
+            while True:
+                with self.lock:
+                    connection = self.idleConnections.pop() if self.idleConnections else None
+                if connection is None:
+                    return self.connect()
+
+                # Only connections that sat idle for a while are worth checking
+                if time.time() - connection.lastUsed < HEALTH_CHECK_INTERVAL or connection.isHealthy():
+                    return connection
+                connection.close()
+        except Exception:
+            self.slots.release()
+            raise
+
+    def release(self, connection, broken=False):
+        if broken:
+            connection.close()
+        else:
+            with self.lock:
+                self.idleConnections.append(connection)
+        self.slots.release()
+
+    def connect(self):
+        attempt = 0
+        while True:
+            try:
+                connection = socket.create_connection((self.ip, self.port), self.timeout)
+                connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                return PooledConnection(connection)
+            except socket.error as e:
+                attempt += 1
+                if self.maxAttempts is not None and attempt >= self.maxAttempts:
+                    raise
+                delay = backoffDelay(attempt)
+                log.warning("Failed to connect to %s:%s: %s. Retrying in %.1fs", self.ip, self.port, e, delay)
+                time.sleep(delay)
+
+    def healthCheck(self):
+        # Drop every idle connection the server has closed meanwhile
+        with self.lock:
+            healthy = [c for c in self.idleConnections if c.isHealthy()]
+            for connection in self.idleConnections:
+                if connection not in healthy:
+                    connection.close()
+            self.idleConnections = healthy
+
+    def close(self):
+        with self.lock:
+            for connection in self.idleConnections:
+                connection.close()
+            self.idleConnections = []
+# ********************************** ConnectionPool **********************************
+
+# ********************************** MulticastProber **********************************
+class MulticastProber(object):
+    # MARK: Constructor
+    def __init__(self, timeout=TIMEOUT):
+        self.lock = threading.Lock()
+        self.probeSocket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.probeSocket.settimeout(timeout)
+        # Set the time-to-live for messages to 1 so they do not go past the
+        # local network segment.
+        ttl = struct.pack('b', 1)
+        self.probeSocket.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, ttl)
+
+    # MARK: Methods
+    def probe(self, serialized_message_string, address):
+        # Send a probe and wait for the first answer, reusing the same socket for every probe
+        with self.lock:
+            self.probeSocket.sendto(serialized_message_string, address)
+            return self.probeSocket.recvfrom(BUFFSIZE)
+# ********************************** MulticastProber **********************************
+
+# MARK: Functions
+def backoffDelay(attempt, initial=INITIAL_BACKOFF, maximum=MAX_BACKOFF):
+    # Exponential backoff with full jitter
+    return random.uniform(0, min(maximum, initial * (2 ** attempt)))
+
+sharedProber = None
+sharedProberLock = threading.Lock()
+
+def getMulticastProber():
+    # One UDP socket per process for every multicast probe
+    global sharedProber
+    with sharedProberLock:
+        if sharedProber is None:
+            sharedProber = MulticastProber()
+        return sharedProber
@@ -0,0 +1,144 @@
+import select
+import socket
+import struct
+import threading
+import time
+import message_pb2
+
+from framing import encodeVarint
+from multicastReceiver import SourceRateLimiter
+from multicastReceiver import WOULD_BLOCK
+from multicastReceiver import setReceiveBuffer
+from asyncLogger import getLogger
+from myconfig import BUFFSIZE
+
+# Optional settings, myconfig.py may leave them out
+try:
+    from myconfig import DISCOVERY_ACK_RATE
+except ImportError:
+    # ACKs per second accepted from a single address, None for no limit. A process answers with one ACK
+    # per sensor it hosts, so this is far above MULTICAST_SOURCE_RATE.
+    DISCOVERY_ACK_RATE = 5000
+
+# MARK: Constants
+log = getLogger("sensorDiscovery")
+# Seconds the first probe listens for ACKs, every retry listens twice as long as the previous one
+DISCOVERY_WINDOW = 1.0
+# Probes sent per discovery at most, retries stop as soon as one finds no new sensor
+DISCOVERY_ATTEMPTS = 4
+# Part of the listening window sensors may spread their ACKs over, the rest is left for them to arrive
+REPLY_WINDOW_SHARE = 0.5
+# Key of Message.reply_window_ms (field 8, varint), appended to a serialized probe
+REPLY_WINDOW_TAG = b"\x40"
+
+# MARK: Classes definitions
+# ********************************** SensorDiscovery **********************************
+class SensorDiscovery(object):
+    # Multicasts a finder probe and collects every ACK that comes back before the window closes,
+    # instead of the first one only. Lost probes and ACKs are made up for by probing again with
+    # a longer window, until a probe brings no sensor that was not found already.
+    # MARK: Constructor
+    def __init__(self, registry, window=DISCOVERY_WINDOW, attempts=DISCOVERY_ATTEMPTS, ackRate=DISCOVERY_ACK_RATE):
+        # SensorRegistry every ACK is recorded in
+        self.registry = registry
+        self.window = window
+        self.attempts = attempts
+        # Opened on the first discovery, so worker processes forked meanwhile each get their own
+        self.probeSocket = None
+        # Every ACK is received into this buffer and parsed right away
+        self.receiveBuffer = bytearray(BUFFSIZE)
+        # Drops ACKs of addresses sending faster than ackRate per second, before they are parsed or registered
+        self.rateLimiter = SourceRateLimiter(ackRate) if ackRate else None
+        # One discovery at a time per socket, or they would read each other's ACKs
+        self.lock = threading.Lock()
+
+    # MARK: Methods
+    def discover(self, probe, address):
+        # Returns {sensor id: ACK message} of every sensor that answered the serialized probe
+        found = {}
+        with self.lock:
+            if self.probeSocket is None:
+                self.probeSocket = openProbeSocket()
+            for attempt in range(self.attempts):
+                window = self.window * (2 ** attempt)
+                # Sensors delay their ACKs at random within the reply window, so thousands of them do not
+                # answer in the same instant and overflow the socket's receive buffer
+                replyWindowMs = int(window * REPLY_WINDOW_SHARE * 1000)
+                self.probeSocket.sendto(probe + REPLY_WINDOW_TAG + encodeVarint(replyWindowMs), address)
+                newSensors = self.collectAcks(found, time.time() + window)
+                log.info("Probe %s to %s:%s found %s new sensors, %s in total", attempt + 1, address[0], address[1], newSensors, len(found))
+                if attempt and not newSensors:
+                    break
+        return found
+
+    def collectAcks(self, found, deadline):
+        # Read ACKs until the deadline, returns how many of them came from sensors not found before
+        newSensors = 0
+        while True:
+            timeout = deadline - time.time()
+            if timeout <= 0:
+                return newSensors
+            readable, _, _ = select.select([self.probeSocket], [], [], timeout)
+            if not readable:
+                return newSensors
+            newSensors += self.drainAcks(found)
+
+    def drainAcks(self, found):
+        # Handle every ACK queued on the socket without waiting, a wakeup per burst instead of per ACK
+        newSensors = 0
+        view = memoryview(self.receiveBuffer)
+        while True:
+            try:
+                size, sensorAddress = self.probeSocket.recvfrom_into(self.receiveBuffer)
+            except socket.error as e:
+                if e.errno in WOULD_BLOCK:
+                    return newSensors
+                raise
+            if self.rateLimiter is not None and not self.rateLimiter.allow(sensorAddress):
+                continue
+            message = message_pb2.Message()
+            try:
+                message.ParseFromString(view[:size])
+            except Exception as e:
+                log.warning("Dropping ACK from IP %s: %s", sensorAddress[0], e)
+                continue
+            if message.type != message_pb2.Message.MessageType.MULTICAST_SENSOR_FINDER_ACK:
+                continue
+
+            # Every ACK refreshes the sensor's last seen time, only the first one counts it as found
+            self.registry.updateFromMessage(message, sensorAddress)
+            sensorId = message.sender.sensor_id or "%s:%s"%(sensorAddress[0], sensorAddress[1])
+            if sensorId not in found:
+                found[sensorId] = message
+                newSensors += 1
+
+    def start(self, probe, address, interval=None):
+        # Discover on a thread of its own, so the engines keep serving meanwhile. With an interval,
+        # discovery runs again every interval seconds for as long as the process lives.
+        thread = threading.Thread(target = self.discoverForever, args = (probe, address, interval))
+        thread.daemon = True
+        thread.start()
+        return thread
+
+    def discoverForever(self, probe, address, interval=None):
+        while True:
+            try:
+                self.discover(probe, address)
+            except socket.error as e:
+                log.error("Sensor discovery on %s:%s failed: %s", address[0], address[1], e)
+            if interval is None:
+                return
+            time.sleep(interval)
+# ********************************** SensorDiscovery **********************************
+
+# MARK: Functions
+def openProbeSocket():
+    probeSocket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    # Set the time-to-live for messages to 1 so they do not go past the
+    # local network segment.
+    ttl = struct.pack('b', 1)
+    probeSocket.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, ttl)
+    setReceiveBuffer(probeSocket)
+    # Waited on with select, then drained until it would block
+    probeSocket.setblocking(False)
+    return probeSocket
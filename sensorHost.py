@@ -0,0 +1,4 @@
+from sensors.host import runMultiSensorHost
+
+if __name__ == "__main__":
+    runMultiSensorHost()
@@ -0,0 +1,135 @@
+import heapq
+import threading
+import time
+
+# MARK: Constants
+# Seconds a sensor stays registered without being heard from
+SENSOR_TTL = 60.0
+# Addresses sensors may advertise that only make sense on their own host
+LOCAL_ADDRESSES = ("", "localhost", "0.0.0.0", "127.0.0.1")
+
+# MARK: Classes definitions
+# ********************************** SensorRecord **********************************
+class SensorRecord(object):
+    # Tens of thousands of these stay in memory, __slots__ keeps each one small
+    __slots__ = ("sensorId", "sensorType", "ip", "port", "lastSeen", "heapSeen")
+
+    # MARK: Constructor
+    def __init__(self, sensorId, sensorType, ip, port, lastSeen):
+        self.sensorId = sensorId
+        self.sensorType = sensorType
+        # Where the sensor answers requests
+        self.ip = ip
+        self.port = port
+        self.lastSeen = lastSeen
+        # lastSeen as of the record's entry in the expiry heap
+        self.heapSeen = lastSeen
+
+    # MARK: Methods
+    def address(self):
+        return (self.ip, self.port)
+# ********************************** SensorRecord **********************************
+
+# ********************************** SensorRegistry **********************************
+class SensorRegistry(object):
+    # Every sensor the server has heard of, by id, with indexes by type and by address.
+    # Each record has a single entry in the expiry heap; being seen again only updates lastSeen
+    # and the entry is pushed back with the new time when it reaches the top, so updates are O(1)
+    # and expiring a sensor is O(log n).
+    # MARK: Constructor
+    def __init__(self, ttl=SENSOR_TTL):
+        self.ttl = ttl
+        self.sensors = {}
+        # Sensor type -> set of sensor ids
+        self.byType = {}
+        # (ip, port) -> set of sensor ids, one host may run many sensors
+        self.byAddress = {}
+        # (heapSeen, sensor id) of every record
+        self.expiryHeap = []
+        self.lock = threading.Lock()
+
+    # MARK: Methods
+    def update(self, sensorId, sensorType, ip, port, seenAt=None):
+        seenAt = time.time() if seenAt is None else seenAt
+        with self.lock:
+            record = self.sensors.get(sensorId)
+            if record is None:
+                record = self.sensors[sensorId] = SensorRecord(sensorId, sensorType, ip, port, seenAt)
+                self.index(record)
+                heapq.heappush(self.expiryHeap, (seenAt, sensorId))
+                return record
+
+            if record.sensorType != sensorType or record.ip != ip or record.port != port:
+                self.unindex(record)
+                record.sensorType = sensorType
+                record.ip = ip
+                record.port = port
+                self.index(record)
+            record.lastSeen = max(record.lastSeen, seenAt)
+            return record
+
+    def updateFromMessage(self, message, peer=None, seenAt=None):
+        # Register the sender of a message, None when it is not a sensor
+        sender = message.sender
+        if not sender.sensor_id:
+            return None
+        ip = sender.ip
+        if ip in LOCAL_ADDRESSES and peer is not None:
+            # The sensor does not know its public address, the one it wrote from will do
+            ip = peer[0]
+        return self.update(sender.sensor_id, sender.sensor_type, ip, sender.port, seenAt)
+
+    def get(self, sensorId):
+        return self.sensors.get(sensorId)
+
+    def findByType(self, sensorType):
+        with self.lock:
+            return [self.sensors[sensorId] for sensorId in self.byType.get(sensorType, ())]
+
+    def findByAddress(self, ip, port):
+        with self.lock:
+            return [self.sensors[sensorId] for sensorId in self.byAddress.get((ip, port), ())]
+
+    def remove(self, sensorId):
+        # Its heap entry is dropped when it reaches the top
+        with self.lock:
+            record = self.sensors.pop(sensorId, None)
+            if record is not None:
+                self.unindex(record)
+            return record
+
+    def expire(self, now=None):
+        # Remove and return every sensor not seen for ttl seconds
+        deadline = (time.time() if now is None else now) - self.ttl
+        expired = []
+        with self.lock:
+            while self.expiryHeap and self.expiryHeap[0][0] < deadline:
+                heapSeen, sensorId = heapq.heappop(self.expiryHeap)
+                record = self.sensors.get(sensorId)
+                if record is None or record.heapSeen != heapSeen:
+                    # Left behind by a removed or re-registered sensor
+                    continue
+                if record.lastSeen < deadline:
+                    del self.sensors[sensorId]
+                    self.unindex(record)
+                    expired.append(record)
+                else:
+                    record.heapSeen = record.lastSeen
+                    heapq.heappush(self.expiryHeap, (record.lastSeen, sensorId))
+        return expired
+
+    def index(self, record):
+        self.byType.setdefault(record.sensorType, set()).add(record.sensorId)
+        self.byAddress.setdefault(record.address(), set()).add(record.sensorId)
+
+    def unindex(self, record):
+        for index, key in ((self.byType, record.sensorType), (self.byAddress, record.address())):
+            sensorIds = index.get(key)
+            if sensorIds is not None:
+                sensorIds.discard(record.sensorId)
+                if not sensorIds:
+                    del index[key]
+
+    def __len__(self):
+        return len(self.sensors)
+# ********************************** SensorRegistry **********************************
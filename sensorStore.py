@@ -0,0 +1,448 @@
+import array
+import bisect
+import errno
+import mmap
+import os
+import queue
+import re
+import tempfile
+import threading
+
+from asyncLogger import getLogger
+
+from sensors.payloads import bowlSamples
+from sensors.payloads import deltaDecode
+from sensors.payloads import deltaEncode
+from sensors.payloads import getTimestamps
+from sensors.payloads import setTimestamps
+
+# Optional settings, myconfig.py may leave them out
+try:
+    from myconfig import SENSOR_STORE_DIR
+except ImportError:
+    SENSOR_STORE_DIR = os.path.join(tempfile.gettempdir(), "socketprotobuf-sensors")
+try:
+    from myconfig import SENSOR_STORE_TTL
+except ImportError:
+    # Seconds a sensor's samples are kept after its last upload, as long as its rollups cover
+    SENSOR_STORE_TTL = 24 * 60 * 60
+
+# MARK: Constants
+log = getLogger("sensorStore")
+# Columns of every kind of series, named after the Message.Object field the samples travel in.
+# Timestamps are milliseconds, coordinates degrees times 10^7 and accelerations thousandths of g.
+SERIES_COLUMNS = {
+    "lamp": ("timestamp", "isOn"),
+    "bowl": ("timestamp", "grams"),
+    "collar": ("timestamp", "latitudeE7", "longitudeE7", "accelerationX", "accelerationY", "accelerationZ"),
+}
+# Doubles hold every value above exactly (integers up to 2^53)
+TYPECODE = "d"
+VALUE_SIZE = array.array(TYPECODE).itemsize
+# Samples written to disk at once, as one segment file
+SEGMENT_SAMPLES = 512
+# Samples of a sensor kept in memory. Twice a segment, so the oldest are always on disk before they are overwritten.
+RING_CAPACITY = 2 * SEGMENT_SAMPLES
+# Segment files kept per sensor, older ones are deleted
+MAX_SEGMENTS = 64
+# Width of a rollup bucket in milliseconds, and how many buckets are kept per sensor (a day of minutes)
+ROLLUP_INTERVAL_MS = 60 * 1000
+MAX_ROLLUPS = 24 * 60
+# Samples a stored reading carries at most, like the readings of the sensors themselves
+MAX_SAMPLES_PER_READING = 60
+# Samples a reading of a time range carries at most, the oldest first: clients ask again from the last one for more
+MAX_SAMPLES_PER_RANGE = 10000
+# Seconds between two looks for series past SENSOR_STORE_TTL
+EXPIRY_INTERVAL = 60
+
+# MARK: Classes definitions
+# ********************************** SeriesRollups **********************************
+class SeriesRollups(object):
+    # Count, sum, min and max of every value column per ROLLUP_INTERVAL_MS bucket, one array per column
+    __slots__ = ("bucketStarts", "counts", "sums", "mins", "maxs")
+
+    # MARK: Constructor
+    def __init__(self, valueColumns):
+        self.bucketStarts = array.array(TYPECODE)
+        self.counts = array.array(TYPECODE)
+        self.sums = [array.array(TYPECODE) for _ in range(valueColumns)]
+        self.mins = [array.array(TYPECODE) for _ in range(valueColumns)]
+        self.maxs = [array.array(TYPECODE) for _ in range(valueColumns)]
+
+    # MARK: Methods
+    def add(self, row):
+        bucketStart = row[0] - row[0] % ROLLUP_INTERVAL_MS
+        # Samples arrive in order, so the bucket is almost always the last one
+        if self.bucketStarts and self.bucketStarts[-1] == bucketStart:
+            index = len(self.bucketStarts) - 1
+        else:
+            index = bisect.bisect_left(self.bucketStarts, bucketStart)
+            if index == len(self.bucketStarts) or self.bucketStarts[index] != bucketStart:
+                self.insert(index, bucketStart, row)
+                return
+
+        self.counts[index] += 1
+        for column, value in enumerate(row[1:]):
+            self.sums[column][index] += value
+            if value < self.mins[column][index]:
+                self.mins[column][index] = value
+            if value > self.maxs[column][index]:
+                self.maxs[column][index] = value
+
+    def insert(self, index, bucketStart, row):
+        self.bucketStarts.insert(index, bucketStart)
+        self.counts.insert(index, 1)
+        for column, value in enumerate(row[1:]):
+            self.sums[column].insert(index, value)
+            self.mins[column].insert(index, value)
+            self.maxs[column].insert(index, value)
+        if len(self.bucketStarts) > MAX_ROLLUPS * 5 // 4:
+            # Trimmed a quarter at a time rather than on every new bucket
+            self.trim(len(self.bucketStarts) - MAX_ROLLUPS)
+
+    def trim(self, count):
+        for values in [self.bucketStarts, self.counts] + self.sums + self.mins + self.maxs:
+            del values[:count]
+
+    def rows(self, limit=MAX_ROLLUPS):
+        # (bucket start, mean of every value column) of the latest buckets, oldest first
+        return [tuple([self.bucketStarts[index]] + [sums[index] / self.counts[index] for sums in self.sums])
+                for index in range(max(len(self.bucketStarts) - limit, 0), len(self.bucketStarts))]
+# ********************************** SeriesRollups **********************************
+
+# ********************************** SensorSeries **********************************
+class SensorSeries(object):
+    # Append-only samples of one sensor, one array per column. The latest RING_CAPACITY samples stay in
+    # memory as a ring, every SEGMENT_SAMPLES of them are also spilled to a memory-mapped segment file.
+    __slots__ = ("sensorId", "kind", "columns", "count", "spilled", "segments", "segmentPrefix", "writer", "rollups", "state", "lastIngest", "lock")
+
+    # MARK: Constructor
+    def __init__(self, sensorId, kind, segmentPrefix, writer):
+        self.sensorId = sensorId
+        self.kind = kind
+        self.columns = [array.array(TYPECODE) for _ in SERIES_COLUMNS[kind]]
+        # Samples appended and samples written to segments since the series was created
+        self.count = 0
+        self.spilled = 0
+        # [first timestamp, last timestamp, samples, path, columns] of every segment file, oldest first.
+        # columns holds the samples until the writer has them on disk, then None.
+        self.segments = []
+        self.segmentPrefix = segmentPrefix
+        # SegmentWriter the files are written and deleted by
+        self.writer = writer
+        self.rollups = SeriesRollups(len(self.columns) - 1)
+        # Last status that is not a sample, e.g. whether a collar is tracking
+        self.state = None
+        # Time of the last upload, in seconds
+        self.lastIngest = 0
+        self.lock = threading.Lock()
+
+    # MARK: Methods
+    def append(self, rows):
+        with self.lock:
+            for row in rows:
+                position = self.count % RING_CAPACITY
+                if len(self.columns[0]) < RING_CAPACITY:
+                    for column, value in zip(self.columns, row):
+                        column.append(value)
+                else:
+                    for column, value in zip(self.columns, row):
+                        column[position] = value
+                self.count += 1
+                self.rollups.add(row)
+                if self.count - self.spilled >= SEGMENT_SAMPLES:
+                    self.spill()
+
+    def spill(self):
+        # Hand the samples not on disk yet to the writer, as a new segment file written column after column
+        rows = self.count - self.spilled
+        columns = [self.ringSlice(column, self.spilled, self.count) for column in self.columns]
+        path = "%s-%d.seg"%(self.segmentPrefix, self.spilled // SEGMENT_SAMPLES)
+        segment = [columns[0][0], columns[0][-1], rows, path, columns]
+        self.segments.append(segment)
+        self.writer.write(segment)
+        self.spilled = self.count
+        if len(self.segments) > MAX_SEGMENTS:
+            self.writer.remove(self.segments.pop(0)[3])
+
+    def removeSegments(self):
+        with self.lock:
+            for segment in self.segments:
+                self.writer.remove(segment[3])
+            self.segments = []
+
+    def ringSlice(self, column, start, end):
+        # Samples start to end, counted since the series was created, of a column of the ring
+        first = start % RING_CAPACITY
+        last = first + (end - start)
+        if last <= RING_CAPACITY:
+            return column[first:last]
+        return column[first:] + column[:last - RING_CAPACITY]
+
+    def latest(self, limit=MAX_SAMPLES_PER_READING):
+        # Rows of the latest samples in memory, oldest first
+        with self.lock:
+            start = self.count - min(limit, self.count, RING_CAPACITY)
+            return list(zip(*[self.ringSlice(column, start, self.count) for column in self.columns]))
+
+    def rollupRows(self, limit=MAX_SAMPLES_PER_READING):
+        # Locked like latest, append inserts and trims the rollup arrays
+        with self.lock:
+            return self.rollups.rows(limit)
+
+    def samples(self, since=None, until=None):
+        # Rows of every sample stored between since and until, in memory or on disk, oldest first
+        with self.lock:
+            inMemory = min(self.count, RING_CAPACITY)
+            rows = list(zip(*[self.ringSlice(column, self.count - inMemory, self.count) for column in self.columns]))
+            # Samples the ring has overwritten already are read back from their segments
+            onDiskOnly = self.count - inMemory
+            diskRows = []
+            firstSample = self.spilled - sum(segment[2] for segment in self.segments)
+            for first, last, count, path, columns in self.segments:
+                needed = min(count, onDiskOnly - firstSample)
+                if needed > 0 and (since is None or last >= since) and (until is None or first <= until):
+                    # Segments the writer has not got to yet are read from memory
+                    segmentRows = list(zip(*columns)) if columns is not None else readSegment(path, len(self.columns), count)
+                    diskRows.extend(segmentRows[:needed])
+                firstSample += count
+            rows = diskRows + rows
+        return [row for row in rows if (since is None or row[0] >= since) and (until is None or row[0] <= until)]
+# ********************************** SensorSeries **********************************
+
+# ********************************** SegmentWriter **********************************
+class SegmentWriter(object):
+    # Writes and deletes segment files on a thread of its own, in the order they were asked for,
+    # so no request waits on the disk
+    # MARK: Constructor
+    def __init__(self):
+        self.jobs = None
+        # Process the thread runs in, a forked child starts its own
+        self.pid = None
+        self.lock = threading.Lock()
+
+    # MARK: Methods
+    def write(self, segment):
+        self.put(writeSegmentOf, segment)
+
+    def remove(self, path):
+        self.put(removeSegment, path)
+
+    def put(self, function, argument):
+        if self.pid != os.getpid():
+            with self.lock:
+                if self.pid != os.getpid():
+                    self.jobs = queue.Queue()
+                    thread = threading.Thread(target = self.run, args = (self.jobs,))
+                    thread.daemon = True
+                    thread.start()
+                    self.pid = os.getpid()
+        self.jobs.put((function, argument))
+
+    def run(self, jobs):
+        while True:
+            function, argument = jobs.get()
+            try:
+                function(argument)
+            except (IOError, OSError) as e:
+                # A segment that could not be written keeps its samples in memory
+                log.error("Sensor store could not update its files: %s", e)
+# ********************************** SegmentWriter **********************************
+
+# ********************************** SensorStore **********************************
+class SensorStore(object):
+    # Time series of every sensor that uploaded readings, so apps can read them from the server
+    # instead of waiting on the sensor
+    # MARK: Constructor
+    def __init__(self, directory=SENSOR_STORE_DIR, ttl=SENSOR_STORE_TTL):
+        self.directory = directory
+        self.series = {}
+        self.lock = threading.Lock()
+        self.writer = SegmentWriter()
+        # Series are kept ttl seconds after their last upload, independently of the sensor registry, so the
+        # segments and rollups of a sensor that went silent for a while can still be read
+        self.ttl = ttl
+        self.nextExpiry = 0
+        removeStaleDirectories(directory)
+
+    # MARK: Methods
+    def ingest(self, message, receivedAt):
+        # Store the typed payload of a sensor's message, returns the number of samples stored
+        sensorId = message.sender.sensor_id
+        payload = message.body.object
+        if not sensorId or not message.body.HasField("object"):
+            return 0
+        kind, rows, state = payloadRows(payload, int(receivedAt * 1000))
+        if kind is None:
+            return 0
+
+        series = self.getSeries(sensorId, kind)
+        if state is not None:
+            series.state = state
+        series.lastIngest = max(series.lastIngest, receivedAt)
+        series.append(rows)
+        if receivedAt >= self.nextExpiry:
+            self.expire(receivedAt)
+        return len(rows)
+
+    def getSeries(self, sensorId, kind=None):
+        # With a kind, the series is created when missing
+        series = self.series.get(sensorId)
+        if series is None and kind is not None:
+            with self.lock:
+                series = self.series.get(sensorId)
+                if series is None:
+                    # Worker processes share the directory, each one spills to a folder of its own, created by the writer
+                    directory = os.path.join(self.directory, str(os.getpid()))
+                    segmentPrefix = os.path.join(directory, re.sub(r"[^A-Za-z0-9_.-]", "_", sensorId))
+                    series = self.series[sensorId] = SensorSeries(sensorId, kind, segmentPrefix, self.writer)
+        return series
+
+    def fillReading(self, payload, sensorId, rollup=False):
+        # Write the latest samples of a sensor, or its per-interval means, into payload, a message_pb2.Message.Object.
+        # Returns False when nothing is stored for the sensor.
+        series = self.getSeries(sensorId)
+        if series is None:
+            return False
+        rows = series.rollupRows() if rollup else series.latest()
+        fillPayload(payload, series.kind, rows, series.state)
+        return True
+
+    def fillRange(self, payload, sensorId, since=None, until=None):
+        # Write the samples of a sensor between since and until, in memory or on disk, into payload, up to
+        # MAX_SAMPLES_PER_RANGE of them. Returns False when nothing is stored for the sensor.
+        series = self.getSeries(sensorId)
+        if series is None:
+            return False
+        fillPayload(payload, series.kind, series.samples(since, until)[:MAX_SAMPLES_PER_RANGE], series.state)
+        return True
+
+    def expire(self, now):
+        # Remove every series without an upload for ttl seconds, at most once per EXPIRY_INTERVAL
+        self.nextExpiry = now + EXPIRY_INTERVAL
+        deadline = now - self.ttl
+        with self.lock:
+            expired = [sensorId for sensorId, series in self.series.items() if series.lastIngest < deadline]
+        for sensorId in expired:
+            self.remove(sensorId)
+        return expired
+
+    def remove(self, sensorId):
+        # Forget a sensor and delete its segment files
+        with self.lock:
+            series = self.series.pop(sensorId, None)
+        if series is not None:
+            series.removeSegments()
+        return series
+
+    def samples(self, sensorId, since=None, until=None):
+        series = self.getSeries(sensorId)
+        return series.samples(since, until) if series is not None else []
+
+    def __contains__(self, sensorId):
+        return sensorId in self.series
+
+    def __len__(self):
+        return len(self.series)
+# ********************************** SensorStore **********************************
+
+# MARK: Functions
+def payloadRows(payload, receivedAtMs):
+    # (kind, rows, state) of a Message.Object, rows in SERIES_COLUMNS order
+    if payload.HasField("bowl"):
+        return "bowl", bowlSamples(payload.bowl), None
+    if payload.HasField("collar"):
+        collar = payload.collar
+        rows = zip(getTimestamps(collar), deltaDecode(collar.latitude_deltas_e7), deltaDecode(collar.longitude_deltas_e7),
+                   collar.acceleration_x_mg, collar.acceleration_y_mg, collar.acceleration_z_mg)
+        return "collar", list(rows), collar.is_tracking
+    if payload.HasField("lamp"):
+        # A lamp reports its state, the sample is timed by its arrival
+        return "lamp", [(receivedAtMs, int(payload.lamp.is_on))], None
+    return None, [], None
+
+def fillPayload(payload, kind, rows, state):
+    # Inverse of payloadRows, values are rounded back to the integers they travel as. Timestamps travel as
+    # unsigned deltas, so rows are put in time order first: a sensor whose clock stepped back stores them out of order.
+    rows = sorted(rows, key = lambda row: row[0])
+    columns = [[int(round(value)) for value in column] for column in zip(*rows)] or [[] for _ in SERIES_COLUMNS[kind]]
+    if kind == "lamp":
+        payload.lamp.is_on = bool(columns[1][-1]) if rows else False
+    elif kind == "bowl":
+        setTimestamps(payload.bowl, columns[0])
+        payload.bowl.grams.extend(columns[1])
+    elif kind == "collar":
+        collar = payload.collar
+        if state is not None:
+            collar.is_tracking = state
+        setTimestamps(collar, columns[0])
+        collar.latitude_deltas_e7.extend(deltaEncode(columns[1]))
+        collar.longitude_deltas_e7.extend(deltaEncode(columns[2]))
+        collar.acceleration_x_mg.extend(columns[3])
+        collar.acceleration_y_mg.extend(columns[4])
+        collar.acceleration_z_mg.extend(columns[5])
+
+def writeSegment(path, columns):
+    # Every column as contiguous doubles, one after the other
+    size = sum(len(column) for column in columns) * VALUE_SIZE
+    with open(path, "wb+") as segmentFile:
+        segmentFile.truncate(size)
+        segment = mmap.mmap(segmentFile.fileno(), size)
+        try:
+            offset = 0
+            for column in columns:
+                data = column.tobytes()
+                segment[offset:offset + len(data)] = data
+                offset += len(data)
+        finally:
+            segment.close()
+
+def writeSegmentOf(segment):
+    # Runs on the writer's thread, the segment's samples are dropped from memory once they are on disk
+    directory = os.path.dirname(segment[3])
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    writeSegment(segment[3], segment[4])
+    segment[4] = None
+
+def readSegment(path, columnCount, count):
+    # Rows of a segment file written by writeSegment
+    with open(path, "rb") as segmentFile:
+        segment = mmap.mmap(segmentFile.fileno(), 0, access = mmap.ACCESS_READ)
+        try:
+            columnSize = count * VALUE_SIZE
+            columns = [array.array(TYPECODE, segment[column * columnSize:(column + 1) * columnSize]) for column in range(columnCount)]
+        finally:
+            segment.close()
+    return list(zip(*columns))
+
+def removeSegment(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+def removeStaleDirectories(directory):
+    # Delete the segment folders of worker processes that are gone, a restarted server never reads them
+    try:
+        names = os.listdir(directory)
+    except OSError:
+        return
+    for name in names:
+        path = os.path.join(directory, name)
+        if not name.isdigit() or not os.path.isdir(path) or isProcessAlive(int(name)):
+            continue
+        for segmentName in os.listdir(path):
+            removeSegment(os.path.join(path, segmentName))
+        try:
+            os.rmdir(path)
+        except OSError as e:
+            log.warning("Could not remove %s: %s", path, e)
+
+def isProcessAlive(pid):
+    try:
+        os.kill(pid, 0)
+    except OSError as e:
+        # EPERM: alive, but someone else's
+        return e.errno == errno.EPERM
+    return True
@@ -0,0 +1,10 @@
+from sensors.dogBowl import DogBowlSensor
+from sensors.dogCollar import DogCollarSensor
+from sensors.lamp import LampSensor
+
+# Sensor classes by the sensor type they report
+SENSOR_TYPES = {
+    LampSensor.sensorType: LampSensor,
+    DogBowlSensor.sensorType: DogBowlSensor,
+    DogCollarSensor.sensorType: DogCollarSensor,
+}
@@ -0,0 +1,88 @@
+import os
+import socket
+import time
+import message_pb2
+
+from messagePool import MessagePool
+from messagePool import serializeSender
+
+# MARK: Constants
+# Seconds between two samples of sensors that measure more often than they report
+SAMPLE_INTERVAL = 1.0
+# Samples a single reading carries at most
+MAX_SAMPLES_PER_READING = 60
+# Port advertised by sensors with no TCP server of their own, the server never forwards requests to them
+NOT_LISTENING = 0
+
+# MARK: Global variables
+# Shared by every sensor of the process, pools are per thread
+messagePool = MessagePool()
+
+# MARK: Classes definitions
+# ********************************** Sensor **********************************
+class Sensor(object):
+    # Every sensor type overrides this, it travels in Sender.sensor_type
+    sensorType = "sensor"
+
+    # MARK: Constructor
+    def __init__(self, sensorId, ip="localhost", port=NOT_LISTENING):
+        self.sensorId = sensorId
+        self.ip = ip
+        self.port = port
+        # Sender never changes, it is serialized once and appended to every message
+        self.serializedSender = serializeSender(ip, port, sensorId, self.sensorType)
+        self.lastSampledAt = None
+
+    # MARK: Plugin methods, overridden by every sensor type
+    def generateData(self, payload):
+        # Write a fresh reading into payload, a message_pb2.Message.Object
+        pass
+
+    def changeStatus(self, message, payload):
+        # Apply a CHANGE_SENSOR_STATUS_REQUEST and write the resulting status into payload
+        pass
+
+    # MARK: Methods
+    def handleMessage(self, message):
+        # Serialized answer to a request meant for this sensor, None when it has nothing to say
+        if message.type == message_pb2.Message.MessageType.CHANGE_SENSOR_STATUS_REQUEST:
+            # Used by app and server to request sensor status
+            return self.getProtoMessage("", message_pb2.Message.MessageType.CHANGE_SENSOR_STATUS_RESPONSE, lambda payload: self.changeStatus(message, payload))
+        if message.type == message_pb2.Message.MessageType.READ_SENSOR_DATA_REQUEST:
+            # Used by app and server to request sensor data
+            return self.generateSensorDataMessage()
+        if message.type == message_pb2.Message.MessageType.MULTICAST_SENSOR_FINDER:
+            # Used by server to find sensors on the internet
+            return self.getProtoMessage("%s sensor %s is alive"%(self.sensorType, self.sensorId), message_pb2.Message.MessageType.MULTICAST_SENSOR_FINDER_ACK)
+        return None
+
+    def generateSensorDataMessage(self):
+        return self.getProtoMessage("", message_pb2.Message.MessageType.READ_SENSOR_DATA_RESPONSE, self.generateData)
+
+    def sampleTimes(self):
+        # Millisecond timestamps of the samples taken since the last call, one every SAMPLE_INTERVAL up to now
+        now = time.time()
+        count = 1
+        if self.lastSampledAt is not None:
+            count = min(max(int((now - self.lastSampledAt) / SAMPLE_INTERVAL), 1), MAX_SAMPLES_PER_READING)
+        self.lastSampledAt = now
+        return [int((now - (count - 1 - index) * SAMPLE_INTERVAL) * 1000) for index in range(count)]
+
+    def getProtoMessage(self, description="teste", messageType=message_pb2.Message.MessageType.DEFAULT, fillPayload=None):
+        # fillPayload(payload), when given, writes the typed payload into message.body.object
+        message = messagePool.acquire()
+        try:
+            message.body.description = description
+            message.type = messageType
+            if fillPayload is not None:
+                fillPayload(message.body.object)
+            return message.SerializeToString() + self.serializedSender
+        finally:
+            messagePool.release(message)
+# ********************************** Sensor **********************************
+
+# MARK: Functions
+def makeSensorId(sensorType, index):
+    # Ids are unique per sensor, so the index counted by every process is prefixed with its host and pid.
+    # Two processes hosting a "lamp-0" would overwrite each other's registry entry and mix their samples.
+    return "%s-%s-%s-%s"%(sensorType, socket.gethostname(), os.getpid(), index)
@@ -0,0 +1,36 @@
+import random
+import time
+
+from sensors.base import Sensor
+from sensors.base import NOT_LISTENING
+from sensors.payloads import setTimestamps
+
+# MARK: Constants
+# Grams of food in a full bowl
+BOWL_CAPACITY = 500
+
+# MARK: Classes definitions
+# ********************************** DogBowlSensor **********************************
+class DogBowlSensor(Sensor):
+    sensorType = "dogBowl"
+
+    # MARK: Constructor
+    def __init__(self, sensorId, ip="localhost", port=NOT_LISTENING):
+        Sensor.__init__(self, sensorId, ip, port)
+        self.grams = BOWL_CAPACITY
+
+    # MARK: Plugin methods
+    def generateData(self, payload):
+        # The bowl is weighed every SAMPLE_INTERVAL and the dog eats a bit between two samples
+        timestamps = self.sampleTimes()
+        setTimestamps(payload.bowl, timestamps)
+        for _ in timestamps:
+            self.grams = max(0, self.grams - random.randint(0, 2))
+            payload.bowl.grams.append(self.grams)
+
+    def changeStatus(self, message, payload):
+        # Any status change refills the bowl
+        self.grams = BOWL_CAPACITY
+        setTimestamps(payload.bowl, [int(time.time() * 1000)])
+        payload.bowl.grams.append(self.grams)
+# ********************************** DogBowlSensor **********************************
@@ -0,0 +1,59 @@
+import random
+
+from sensors.base import Sensor
+from sensors.base import NOT_LISTENING
+from sensors.payloads import COORDINATE_SCALE
+from sensors.payloads import deltaEncode
+from sensors.payloads import setTimestamps
+
+# MARK: Constants
+# Largest move between two samples, in degrees times 10^7 (about 1 m)
+MAX_STEP_E7 = 100
+
+# MARK: Classes definitions
+# ********************************** DogCollarSensor **********************************
+class DogCollarSensor(Sensor):
+    sensorType = "dogCollar"
+
+    # MARK: Constructor
+    def __init__(self, sensorId, ip="localhost", port=NOT_LISTENING):
+        Sensor.__init__(self, sensorId, ip, port)
+        self.isTracking = True
+        # Degrees times 10^7, the unit they travel in
+        self.latitude = int(-3.7319 * COORDINATE_SCALE)
+        self.longitude = int(-38.5267 * COORDINATE_SCALE)
+
+    # MARK: Plugin methods
+    def generateData(self, payload):
+        # Position and acceleration are sampled every SAMPLE_INTERVAL while tracking, the dog wanders around in between
+        collar = payload.collar
+        collar.is_tracking = self.isTracking
+        timestamps = self.sampleTimes()
+        if not self.isTracking:
+            return
+
+        latitudes = []
+        longitudes = []
+        for _ in timestamps:
+            self.latitude += random.randint(-MAX_STEP_E7, MAX_STEP_E7)
+            self.longitude += random.randint(-MAX_STEP_E7, MAX_STEP_E7)
+            latitudes.append(self.latitude)
+            longitudes.append(self.longitude)
+            collar.acceleration_x_mg.append(random.randint(-200, 200))
+            collar.acceleration_y_mg.append(random.randint(-200, 200))
+            collar.acceleration_z_mg.append(1000 + random.randint(-50, 50))
+        setTimestamps(collar, timestamps)
+        collar.latitude_deltas_e7.extend(deltaEncode(latitudes))
+        collar.longitude_deltas_e7.extend(deltaEncode(longitudes))
+
+    def changeStatus(self, message, payload):
+        # A typed collar state, or "on" and "off" in the description, switch GPS tracking, anything else toggles it
+        wantedStatus = message.body.description
+        if message.body.object.HasField("collar"):
+            self.isTracking = message.body.object.collar.is_tracking
+        elif wantedStatus in ("on", "off"):
+            self.isTracking = wantedStatus == "on"
+        else:
+            self.isTracking = not self.isTracking
+        payload.collar.is_tracking = self.isTracking
+# ********************************** DogCollarSensor **********************************
@@ -0,0 +1,161 @@
+import asyncio
+import heapq
+import random
+
+from framing import FrameBuffer
+from framing import MIN_READ_SIZE
+from framing import encodeFrame
+from sensorClient import backoffDelay
+from sensors import SENSOR_TYPES
+from sensors.base import makeSensorId
+
+# resource only exists on Unix
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# MARK: Constants
+# Seconds between two uploads of every virtual sensor
+SEND_INTERVAL = 10
+# Connections being opened at the same time, so start up does not flood the server's backlog
+CONNECT_CONCURRENCY = 256
+# Seconds between two progress reports
+REPORT_INTERVAL = 10
+
+# MARK: Classes definitions
+# ********************************** VirtualSensorConnection **********************************
+class VirtualSensorConnection(asyncio.Protocol):
+    # MARK: Constructor
+    def __init__(self, host, sensor):
+        self.host = host
+        self.sensor = sensor
+        self.transport = None
+        self.frameBuffer = FrameBuffer(capacity=MIN_READ_SIZE)
+        self.reconnectAttempt = 0
+
+    # MARK: Methods
+    def connection_made(self, transport):
+        self.transport = transport
+        self.reconnectAttempt = 0
+        self.host.connected += 1
+
+    def data_received(self, data):
+        try:
+            self.host.responsesReceived += len(self.frameBuffer.feed(data))
+        except ValueError:
+            self.transport.close()
+
+    def connection_lost(self, exc):
+        self.transport = None
+        self.frameBuffer = FrameBuffer(capacity=MIN_READ_SIZE)
+        self.host.connected -= 1
+        self.host.scheduleReconnect(self)
+
+    def sendReading(self):
+        # A sensor whose connection is down just skips this reading
+        if self.transport is None or self.transport.is_closing():
+            self.host.readingsSkipped += 1
+            return
+        self.transport.write(encodeFrame(self.sensor.generateSensorDataMessage()))
+        self.host.readingsSent += 1
+# ********************************** VirtualSensorConnection **********************************
+
+# ********************************** MultiSensorHost **********************************
+class MultiSensorHost(object):
+    # MARK: Constructor
+    def __init__(self, ip, port, interval=SEND_INTERVAL):
+        self.ip = ip
+        self.port = port
+        self.interval = interval
+        self.connections = []
+        # (due time, sequence, connection) of every sensor's next reading. One heap drives every
+        # sensor's timer, instead of one timer handle or task per sensor.
+        self.timers = []
+        self.connected = 0
+        self.readingsSent = 0
+        self.readingsSkipped = 0
+        self.responsesReceived = 0
+        self.loop = None
+        self.connectSlots = None
+
+    # MARK: Methods
+    def addSensor(self, sensor):
+        self.connections.append(VirtualSensorConnection(self, sensor))
+
+    def startHost(self):
+        raiseOpenFilesLimit()
+        asyncio.run(self.run())
+
+    async def run(self):
+        self.loop = asyncio.get_running_loop()
+        self.connectSlots = asyncio.Semaphore(CONNECT_CONCURRENCY)
+
+        await asyncio.gather(*[self.connect(connection) for connection in self.connections])
+        print("%s of %s virtual sensors connected to %s:%s"%(self.connected, len(self.connections), self.ip, self.port))
+
+        # Spread first readings over a whole interval so sensors do not upload in lock-step
+        now = self.loop.time()
+        for sequence, connection in enumerate(self.connections):
+            heapq.heappush(self.timers, (now + random.uniform(0, self.interval), sequence, connection))
+
+        self.loop.call_later(REPORT_INTERVAL, self.report)
+        await self.runTimers()
+
+    async def runTimers(self):
+        while self.timers:
+            dueTime, sequence, connection = self.timers[0]
+            delay = dueTime - self.loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+                continue
+
+            heapq.heapreplace(self.timers, (dueTime + self.interval, sequence, connection))
+            connection.sendReading()
+
+    async def connect(self, connection):
+        async with self.connectSlots:
+            try:
+                await self.loop.create_connection(lambda: connection, self.ip, self.port)
+            except OSError as e:
+                print("Sensor %s failed to connect: %s"%(connection.sensor.sensorId, e))
+                self.scheduleReconnect(connection)
+
+    def scheduleReconnect(self, connection):
+        connection.reconnectAttempt += 1
+        delay = backoffDelay(connection.reconnectAttempt)
+        self.loop.call_later(delay, lambda: self.loop.create_task(self.connect(connection)))
+
+    def report(self):
+        print("Sensors connected: %s/%s, readings sent: %s, skipped: %s, responses: %s"%(self.connected, len(self.connections), self.readingsSent, self.readingsSkipped, self.responsesReceived))
+        self.loop.call_later(REPORT_INTERVAL, self.report)
+# ********************************** MultiSensorHost **********************************
+
+# MARK: Functions
+def raiseOpenFilesLimit():
+    # Every virtual sensor holds a socket, the default limit of 1024 open files is far too low
+    if resource is None:
+        return
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if hard == resource.RLIM_INFINITY or soft < hard:
+        try:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+        except (ValueError, OSError) as e:
+            print("Could not raise the open files limit: %s"%(e))
+
+def runMultiSensorHost():
+    print("\n** Welcome to my SocketProtobuf app! Send a message using Protobuffer in TCP/UDP mode! **\n\n")
+
+    try:
+        ip = input("Enter an ip address to send data continuously (Ex.: 'localhost', '127.0.0.1', ''): ")
+        port = int(input("Enter a port: "))
+        host = MultiSensorHost(str(ip), int(port))
+        for sensorType, sensorClass in sorted(SENSOR_TYPES.items()):
+            sensors = int(input("Enter how many %s sensors to simulate (default 0): "%(sensorType)) or 0)
+            for index in range(sensors):
+                host.addSensor(sensorClass(makeSensorId(sensorType, index)))
+        host.startHost()
+    except ValueError as e:
+        print(e)
+
+    print("** This is the end! **")
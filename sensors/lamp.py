@@ -0,0 +1,28 @@
+from sensors.base import Sensor
+from sensors.base import NOT_LISTENING
+
+# MARK: Classes definitions
+# ********************************** LampSensor **********************************
+class LampSensor(Sensor):
+    sensorType = "lamp"
+
+    # MARK: Constructor
+    def __init__(self, sensorId, ip="localhost", port=NOT_LISTENING):
+        Sensor.__init__(self, sensorId, ip, port)
+        self.isOn = False
+
+    # MARK: Plugin methods
+    def generateData(self, payload):
+        payload.lamp.is_on = self.isOn
+
+    def changeStatus(self, message, payload):
+        # A typed lamp state, or "on" and "off" in the description, set the lamp, anything else toggles it
+        wantedStatus = message.body.description
+        if message.body.object.HasField("lamp"):
+            self.isOn = message.body.object.lamp.is_on
+        elif wantedStatus in ("on", "off"):
+            self.isOn = wantedStatus == "on"
+        else:
+            self.isOn = not self.isOn
+        self.generateData(payload)
+# ********************************** LampSensor **********************************
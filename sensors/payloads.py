@@ -0,0 +1,48 @@
+# Helpers for the typed sensor payloads of Message.Object, used by sensors to write them
+# and by the server to read them back.
+
+# MARK: Constants
+# Coordinates travel as integer degrees times 10^7
+COORDINATE_SCALE = 10000000
+
+# MARK: Functions
+def deltaEncode(values):
+    # First value as is, every other one as the change from the previous one
+    deltas = []
+    previous = 0
+    for value in values:
+        deltas.append(value - previous)
+        previous = value
+    return deltas
+
+def deltaDecode(deltas):
+    values = []
+    value = 0
+    for delta in deltas:
+        value += delta
+        values.append(value)
+    return values
+
+def setTimestamps(series, timestamps):
+    # series is a BowlWeight or a CollarTrack, timestamps are milliseconds in ascending order
+    if not timestamps:
+        return
+    series.base_timestamp_ms = timestamps[0]
+    series.timestamp_deltas_ms.extend(deltaEncode(timestamps)[1:])
+
+def getTimestamps(series):
+    if not series.HasField("base_timestamp_ms"):
+        return []
+    return deltaDecode([series.base_timestamp_ms] + list(series.timestamp_deltas_ms))
+
+def bowlSamples(bowl):
+    # [(timestamp ms, grams)] of a BowlWeight
+    return list(zip(getTimestamps(bowl), bowl.grams))
+
+def collarSamples(collar):
+    # [(timestamp ms, latitude, longitude, (x, y, z) acceleration in mg)] of a CollarTrack
+    latitudes = deltaDecode(collar.latitude_deltas_e7)
+    longitudes = deltaDecode(collar.longitude_deltas_e7)
+    accelerations = zip(collar.acceleration_x_mg, collar.acceleration_y_mg, collar.acceleration_z_mg)
+    return [(timestamp, float(latitude) / COORDINATE_SCALE, float(longitude) / COORDINATE_SCALE, acceleration)
+            for timestamp, latitude, longitude, acceleration in zip(getTimestamps(collar), latitudes, longitudes, accelerations)]
@@ -0,0 +1,165 @@
+import threading
+import time
+import message_pb2
+
+from framing import appendRequestId
+from messageBatch import BatchBuffer
+from requestContext import parseRequest
+from sensors.base import NOT_LISTENING
+from sensors.base import makeSensorId
+from multicastReceiver import MulticastReceiver
+from sensorClient import ConnectionPool
+from sensorClient import getMulticastProber
+from threadedServer import ThreadedServer
+from myconfig import MULTICAST_GROUP_IP
+from myconfig import MULTICAST_GROUP_PORT
+
+# MARK: Constants
+# Seconds between two uploads of every hosted sensor
+SEND_INTERVAL = 10
+
+# MARK: Classes definitions
+# ********************************** SensorRuntime **********************************
+class SensorRuntime(object):
+    # MARK: Constructor
+    def __init__(self, name="Sensor", ip="localhost", port=NOT_LISTENING):
+        self.name = name
+        self.ip = ip
+        # Advertised in every message, the port startTCPServer listens on
+        self.port = port
+        # Sensors hosted by this process, by sensor id, in the order they were added
+        self.sensors = {}
+        self.sensorList = []
+
+    # MARK: Methods
+    def addSensor(self, sensor):
+        self.sensors[sensor.sensorId] = sensor
+        self.sensorList.append(sensor)
+        return sensor
+
+    def getSensor(self, sensorId):
+        # Requests without a target go to the first sensor, as with a single-sensor process
+        if sensorId:
+            return self.sensors.get(sensorId)
+        return self.sensorList[0] if self.sensorList else None
+
+    def handleMessageAndGetResponse(self, serialized_message_string, peer=None):
+        return self.handleRequest(parseRequest(serialized_message_string, peer))
+
+    def handleMulticastRequest(self, context):
+        # Datagrams may be answered with several replies: every hosted sensor shows up to a finder, each one with its own ACK
+        message = context.message
+        if message.type == message_pb2.Message.MessageType.MULTICAST_SENSOR_FINDER:
+            return True, [sensor.handleMessage(message) for sensor in self.sensorList]
+        return self.handleRequest(context)
+
+    def handleRequest(self, context):
+        # Engines parse every frame once into a RequestContext and hand it over here. One response per request,
+        # a finder over TCP is answered by its target or the first sensor.
+        message = context.message
+        stayInTouch = message.type != message_pb2.Message.MessageType.CLOSE_CONNECTION_REQUEST
+
+        sensor = self.getSensor(message.target_id)
+        if sensor is None:
+            response = self.getProtoMessage("Unknown sensor %s."%(message.target_id))
+        else:
+            response = sensor.handleMessage(message)
+            if response is None:
+                response = sensor.getProtoMessage("Invalid message type.")
+
+        # Pipelining clients correlate responses by the id of their request
+        if message.HasField("request_id"):
+            response = appendRequestId(response, message.request_id)
+        return stayInTouch, response
+
+    def getProtoMessage(self, description="teste", messageType=message_pb2.Message.MessageType.DEFAULT):
+        message = message_pb2.Message()
+        message.body.description = description
+        message.type = messageType
+        message.sender.ip = self.ip
+        message.sender.port = self.port
+        return message.SerializeToString()
+
+    def startTCPServer(self, ip, port):
+        # One TCP server answers requests for every hosted sensor, routed by target_id, on a thread of
+        # its own. Sensors added afterwards advertise its port, 0 picks any free one.
+        server = ThreadedServer(ip, port, self.handleRequest, name=self.name)
+        self.port = server.port
+        thread = threading.Thread(target = server.startTCPServer)
+        thread.daemon = True
+        thread.start()
+        return thread
+
+    def waitForServerFinderSignal(self):
+        MulticastReceiver("", MULTICAST_GROUP_PORT, MULTICAST_GROUP_IP, self.handleMulticastRequest,
+                          name="%s Multicast Server"%(self.name)).waitForFinderSignal()
+
+    def sendSensorData(self, ip, port, interval=SEND_INTERVAL):
+        # Pooled connection that reconnects with jittered backoff, so a server restart does not kill the sensors
+        serverConnections = ConnectionPool(ip, port, size=1)
+        # Readings of every hosted sensor go out together, in one frame and one write
+        batch = BatchBuffer(self.ip, self.port, batchSize=len(self.sensorList))
+
+        stayInTouch = True
+        while stayInTouch:
+            if len(self.sensorList) == 1:
+                # Send the sensor data to server and receive a response
+                responseFromServer = serverConnections.request(self.sensorList[0].generateSensorDataMessage())
+            else:
+                for sensor in self.sensorList:
+                    batch.add(sensor.generateSensorDataMessage())
+                responseFromServer = serverConnections.request(batch.drain())
+
+            response = parseSerializedStringIntoMessageObj(responseFromServer)
+            print ("SERVER SAID: %s"%(response))
+
+            stayInTouch = response.type != message_pb2.Message.MessageType.CLOSE_CONNECTION_REQUEST
+            time.sleep(interval)
+
+        # Close connection
+        serverConnections.close()
+
+    def findServerOnTheInternet(self, ip, port):
+        # Send a message to server and receive a response, the probe socket is shared by every probe
+        finder = self.getProtoMessage("description", message_pb2.Message.MessageType.MULTICAST_SERVER_FINDER)
+        response, server = getMulticastProber().probe(finder, (ip, port))
+        response = parseSerializedStringIntoMessageObj(response)
+        print ("SERVER SAID: %s"%(response))
+        return response
+# ********************************** SensorRuntime **********************************
+
+# MARK: Functions
+def parseSerializedStringIntoMessageObj(serialized_message_string):
+    message = message_pb2.Message()
+    message.ParseFromString(serialized_message_string)
+    return message
+
+def runSensorScript(sensorClass, name):
+    print("\n** Welcome to my SocketProtobuf app! Send a message using Protobuffer in TCP/UDP mode! **\n\n")
+
+    runtime = SensorRuntime(name)
+
+    # 1 svr-cli
+    # runtime.addSensor(sensorClass(makeSensorId(sensorClass.sensorType, 0), runtime.ip, runtime.port))
+    # runtime.waitForServerFinderSignal()
+
+    # 2 cli-svr
+    # runtime.findServerOnTheInternet(MULTICAST_GROUP_IP, MULTICAST_GROUP_PORT)
+
+    # 3 cli-svr
+    try:
+        ip = input("Enter an ip address to send data continuously (Ex.: 'localhost', '127.0.0.1', ''): ")
+        port = int(input("Enter a port: "))
+        sensors = int(input("Enter how many sensors this process should simulate (default 1): ") or 1)
+        listenPort = int(input("Enter a port to answer the server's requests on (default any free port): ") or 0)
+        # Listening before the sensors are created, so they advertise the port the server can reach them on
+        runtime.startTCPServer("", listenPort)
+        for index in range(sensors):
+            runtime.addSensor(sensorClass(makeSensorId(sensorClass.sensorType, index), runtime.ip, runtime.port))
+        # Apps address them by these ids in target_id
+        print("Hosting sensors %s on port %s"%(", ".join(sensor.sensorId for sensor in runtime.sensorList), runtime.port))
+        runtime.sendSensorData(str(ip), int(port))
+    except ValueError as e:
+        print(e)
+
+    print("** This is the end! **")
@@ -1,165 +1,73 @@
+import datetime
+import multiprocessing
 import socket
 import threading
-import datetime
-import sys
+import time
 import message_pb2
-import struct
 
-from myconfig import BUFFSIZE
-from myconfig import TIMEOUT
+from framing import encodeVarint
+from framing import appendRequestId
+from requestContext import parseRequest
+from messagePool import MessagePool
+from messagePool import serializeSender
+from messageBatch import BATCH_TAG
+from messageBatch import BATCH_MESSAGES_TAG
+from sensorClient import ConnectionPool
+from sensorRegistry import SensorRegistry
+from sensorRegistry import LOCAL_ADDRESSES
+from sensorDiscovery import SensorDiscovery
+from sensorStore import SensorStore
+from sensors.base import NOT_LISTENING
+from serverLauncher import MultiProcessLauncher
+from serverStats import getServerStats
+from metricsServer import MetricsServer
+from threadedServer import ThreadedServer
+from asyncLogger import getLogger
 from myconfig import MULTICAST_GROUP_IP
 from myconfig import MULTICAST_GROUP_PORT
 
-# MARK: Global variables
-requestsReceived = 0
-serverStartedSince = datetime.datetime.now()
+# Optional settings, myconfig.py may leave them out
+try:
+    from myconfig import SENSOR_REQUEST_TIMEOUT
+except ImportError:
+    # Seconds to wait for a sensor a request is forwarded to
+    SENSOR_REQUEST_TIMEOUT = 2.0
 
-# MARK: Classes definitions
-# ********************************** ThreadedServer **********************************
-class ThreadedServer(object):
-    # MARK: Constructor
-    def __init__(self, ip, port):
-        self.ip = ip
-        self.port = port
+# MARK: Constants
+# Threads of a worker answering the other workers, only busy with requests for sensors they do not know
+SIBLING_SERVER_WORKERS = 8
 
-        try:
-            self.serverSocket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            # [Errno 98] Address already in use
-            # the SO_REUSEADDR flag tells the kernel to reuse a local socket in TIME_WAIT state, 
-            # without waiting for its natural timeout to expire.
-            self.serverSocket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        except socket.error as e:
-            print("Failed to create socket: %s"%(e))
-            sys.exit()
-
-        try:
-            self.serverSocket.bind((self.ip, self.port))
-            # Server's up
-            print("Server is up and ready to receive connections in TCP MODE! IP '%s' and PORT '%s'"%(self.ip, self.port))
-        except socket.error as e:
-            print("Failed to bind: %s"%(e))
-            sys.exit()
-
-    # MARK: Methods
-    def startTCPServer(self):
-        # Listen for connections made to the socket. The backlog argument specifies the maximum number of 
-        # queued connections and should be at least 0; the maximum value is system-dependent (usually 5), 
-        # the minimum value is forced to 0.
-        self.serverSocket.listen(5)
-
-        while True:
-            # Wait until a client connects
-            clientConnection, clientAddress = self.serverSocket.accept()
-            clientConnection.settimeout(TIMEOUT)
-
-            # Throw a thread in order to handle simultaneous clients
-            threading.Thread(target = self.handleTCPClientConnection,args = (clientConnection, clientAddress)).start()
-
-    def handleTCPClientConnection(self, clientConnection, clientAddress):
-        print("Client connected from IP %s"%(clientAddress[0]))
-
-        # Stay in touch to client until he/she leaves
-        stayInTouch = True
-
-        while stayInTouch:
-            # Get client's message
-            messageFromClient = clientConnection.recv(BUFFSIZE)
-            if messageFromClient:
-                print("MESSAGE FROM IP %s: %s"%(clientAddress[0], parseMessage(messageFromClient)))
-
-                # Handle the message according to received signal and send a response to client
-                stayInTouch, response = handleMessageAndGetResponse(messageFromClient)
-
-                # Reply client
-                clientConnection.send(response)
-
-        # Close connection when user sends a CLOSE signal
-        clientConnection.close()
-        print("Client disconnected from IP %s"%(clientAddress[0]))
-# ********************************** ThreadedServer **********************************
-
-# ********************************** MulticastReceiver **********************************
-class MulticastReceiver(object):
-    # MARK: Constructor
-    def __init__(self, ip, port, ip_group):
-        self.ip = ip
-        self.port = port
-        self.ip_group = ip_group
-
-        try:
-            self.serverSocket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-            # [Errno 98] Address already in use
-            # the SO_REUSEADDR flag tells the kernel to reuse a local socket in TIME_WAIT state, 
-            # without waiting for its natural timeout to expire.
-            self.serverSocket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        except socket.error as e:
-            print("Failed to create socket: %s"%(e))
-            sys.exit()
-
-        try:
-            # Bind to the server address
-            self.serverSocket.bind((self.ip, self.port))
-            # Server's up
-            print("Multicast Server is up and ready to receive connections in UDP MODE! IP '%s' and PORT '%s'"%(self.ip, self.port))
-        except socket.error as e:
-            print("Failed to bind: %s"%(e))
-            sys.exit()
-
-        # Tell the operating system to add the socket to the multicast group
-        # on all interfaces.
-        group = socket.inet_aton(ip_group)
-        mreq = struct.pack('4sL', group, socket.INADDR_ANY)
-        self.serverSocket.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, mreq)
-
-    # MARK: Methods
-    def waitForSensorFinderSignal(self):
-        threading.Thread(target = self.handleMulticastUDPMessages).start()
-
-    def handleMulticastUDPMessages(self):
-        while True:
-            # Get client's message
-            messageFromClient, clientAddress = self.serverSocket.recvfrom(BUFFSIZE)
-            if messageFromClient:
-                print("MESSAGE FROM IP %s: %s"%(clientAddress[0], parseMessage(messageFromClient)))
-
-                # Handle the message according to received signal and send a response to client
-                stayInTouch, response = handleMessageAndGetResponse(messageFromClient)
-
-                # Reply client
-                self.serverSocket.sendto(response, clientAddress)
-# ********************************** MulticastReceiver **********************************
+# MARK: Global variables
+log = getLogger("server")
+# Reply messages are taken from and given back to a per-thread pool instead of allocated every time
+messagePool = MessagePool()
+SERVER_SENDER = serializeSender("localhost", 5050)
+# Sharded per thread, no lock on the request path
+stats = getServerStats()
+serverStartedSince = datetime.datetime.now()
+# Every sensor this process has heard from, by id
+sensorRegistry = SensorRegistry()
+sensorDiscovery = SensorDiscovery(sensorRegistry)
+# Readings every sensor uploaded, served to apps without asking the sensor
+sensorStore = SensorStore()
+# (ip, port) -> ConnectionPool to the sensors listening there
+sensorPools = {}
+sensorPoolsLock = threading.Lock()
+# (ip, port) this process serves on, requests are never forwarded there
+serverAddress = None
+# With several worker processes, each one only knows the sensors that reported to it. A worker asks the others,
+# on the loopback ports they publish in siblingPorts, for the sensors it does not know.
+workerIndex = None
+siblingPorts = None
+# Set on the threads serving other workers, which answer from their own registry and store only
+siblingThread = threading.local()
 
 # MARK: Functions
 # ********************************** findSensorsOnTheInternet **********************************
-def findSensorsOnTheInternet(ip, port):
-	try:
-		sensorConnection = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-		sensorConnection.settimeout(TIMEOUT)
-		# Set the time-to-live for messages to 1 so they do not go past the
-		# local network segment.
-		ttl = struct.pack('b', 1)
-		sensorConnection.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, ttl)
-	except socket.error as e:
-		print("Failed to create socket: %s"%(e))
-		sys.exit()
-	
-	# Send a message to sensor
-	sensorConnection.sendto(generateSensorFinderMessage(), (ip, port))
-
-	# Receive a response
-	response, sensor = sensorConnection.recvfrom(BUFFSIZE)
-	print ("SENSOR SAID: %s"%(parseMessage(response)))
-
-	saveSensorIPAndPort(response)
-
-	# Close connection
-	sensorConnection.close()
-
-def saveSensorIPAndPort(serialized_message_string):
-	# TODO
-    message = message_pb2.Message()
-    message.ParseFromString(serialized_message_string)
-    return message
+def findSensorsOnTheInternet(ip, port, interval=None):
+	# Multicast a probe and register every sensor that answers, on a thread of its own so the
+	# engines keep serving. With an interval, sensors are looked for again every interval seconds.
+	return sensorDiscovery.start(generateSensorFinderMessage(), (ip, port), interval)
 
 def generateSensorFinderMessage():
     # TODO
@@ -171,107 +79,388 @@ def generateSensorFinderMessage():
     return message.SerializeToString()
 # ********************************** findSensorsOnTheInternet **********************************
 
-def incrementNumberOfConnections():
-    # Increment number of received connections
-    global requestsReceived
-    requestsReceived += 1
-
-def handleMessageAndGetResponse(serialized_message_string):
-    incrementNumberOfConnections()
-
-    switcher =  {
-        message_pb2.Message.MessageType.CHANGE_SENSOR_STATUS_REQUEST: change_sensor_status, # Used by app and server to request sensor status
-        message_pb2.Message.MessageType.CHANGE_SENSOR_STATUS_RESPONSE: reply_sensor_status, # Used by sensor to send sensor status
-       
-        message_pb2.Message.MessageType.READ_SENSOR_DATA_REQUEST: read_sensor_data, # Used by app and server to request sensor data
-        message_pb2.Message.MessageType.READ_SENSOR_DATA_RESPONSE: reply_sensor_data, # Used by sensor to send sensor data
-      
-        message_pb2.Message.MessageType.MULTICAST_SENSOR_FINDER: find_sensor, # Used by server to find sensors on the internet
-        message_pb2.Message.MessageType.MULTICAST_SENSOR_FINDER_ACK: ack_sensor_up, # Used by sensor to show up it is alive
-      
-        message_pb2.Message.MessageType.MULTICAST_SERVER_FINDER: find_server, # Used by sensor to find server on the internet
-        message_pb2.Message.MessageType.MULTICAST_SERVER_FINDER_ACK: ack_server_up, # Used by server to show up it is alive
-
-        message_pb2.Message.MessageType.UPTIME_REQUEST: get_server_uptime, # Used by app to get datetime since server's up
-        message_pb2.Message.MessageType.UPTIME_RESPONSE: reply_server_uptime, # Used by server to send datetime since it's up
-
-        message_pb2.Message.MessageType.REQNUM_REQUEST: get_server_reqnum, # Used by app to get the number of requests since server's up
-        message_pb2.Message.MessageType.REQNUM_RESPONSE: reply_server_reqnum, # Used by server to send the number of requests since it's up
-
-        message_pb2.Message.MessageType.CLOSE_CONNECTION_REQUEST: close_connection, # Used by app to attempt closing connection
-        message_pb2.Message.MessageType.CLOSE_CONNECTION_ACK: ack_close_connection # Used by server to acknowledge
-    }
+def getNumberOfRequests():
+    # Every request of every worker process, batch items included
+    return stats.totalRequests()
 
-    message = message_pb2.Message()
-    message.ParseFromString(serialized_message_string)
-    response = switcher.get(message.type, getProtoMessage("Invalid message type."))
-    stayInTouch = message.type != message_pb2.Message.MessageType.CLOSE_CONNECTION_REQUEST
-    return stayInTouch, response
+def handleMessageAndGetResponse(serialized_message_string, peer=None):
+    return handleRequest(parseRequest(serialized_message_string, peer))
 
-def change_sensor_status():
-    return getProtoMessage()
-def reply_sensor_status():
-    return getProtoMessage()
+def handleRequest(context):
+    # Engines parse every frame once into a RequestContext and hand it over here
+    messageType = context.message.type
+    stats.recordRequest(messageType)
 
-def read_sensor_data():
-    return getProtoMessage()
-def reply_sensor_data():
-    return getProtoMessage()
+    stayInTouch = messageType != message_pb2.Message.MessageType.CLOSE_CONNECTION_REQUEST
+    response = dispatchRequest(context)
 
-def find_sensor():
-    return getProtoMessage()
-def ack_sensor_up():
-    return getProtoMessage()
-
-def find_server():
-    return getProtoMessage()
-def ack_server_up():
-    return getProtoMessage()
+    # From parsed to response ready, in microseconds
+    stats.recordLatency(messageType, (time.time() - context.receivedAt) * 1000000)
+    return stayInTouch, response
 
-def get_server_uptime():
-    return getProtoMessage("The server is running since %s. Total time up: %s"%(serverStartedSince, datetime.datetime.now() - serverStartedSince))
-def reply_server_uptime():
+def dispatchRequest(context):
+    message = context.message
+
+    # Constant replies are a dict lookup, everything else goes to its registered handler
+    response = staticResponses.get(message.type)
+    if response is None:
+        handler = messageHandlers.get(message.type)
+        if handler is not None:
+            response = handler(context)
+        else:
+            stats.recordError()
+            response = INVALID_MESSAGE_TYPE_RESPONSE
+
+    # Pipelining clients correlate responses by the id of their request
+    if message.HasField("request_id"):
+        response = appendRequestId(response, message.request_id)
+    return response
+
+def registerHandler(messageType, handler):
+    # handler(context) gets the RequestContext of the parsed message and returns the serialized response
+    staticResponses.pop(messageType, None)
+    messageHandlers[messageType] = handler
+
+def registerStaticResponse(messageType, description="teste"):
+    # The response is serialized once, here, and reused for every request of this type
+    messageHandlers.pop(messageType, None)
+    staticResponses[messageType] = getProtoMessage(description)
+
+def handle_batch(context):
+    # Every message of the batch is handled in this pass and their serialized responses are
+    # spliced into one BATCH_ACK, field by field, without building a response message per item
+    batch = context.message.batch
+    hasSharedSender = batch.HasField("sender")
+
+    responses = []
+    for item in batch.messages:
+        if hasSharedSender and not item.HasField("sender"):
+            item.sender.CopyFrom(batch.sender)
+        stats.recordRequest(item.type)
+
+        response = dispatchRequest(context.child(item))
+        responses.append(BATCH_MESSAGES_TAG + encodeVarint(len(response)) + response)
+
+    batchField = b"".join(responses)
+    return BATCH_ACK_RESPONSE + BATCH_TAG + encodeVarint(len(batchField)) + batchField
+
+def get_server_uptime(context):
     return getProtoMessage("The server is running since %s. Total time up: %s"%(serverStartedSince, datetime.datetime.now() - serverStartedSince))
 
-def get_server_reqnum():
-    return getProtoMessage("Number of requests received, including this one: %s"%(requestsReceived))
-def reply_server_reqnum():
-    return getProtoMessage("Number of requests received, including this one: %s"%(requestsReceived))
+def get_server_reqnum(context):
+    return getProtoMessage("Number of requests received, including this one: %s"%(getNumberOfRequests()))
 
-def close_connection():
-    return getProtoMessage()
-def ack_close_connection():
-    return getProtoMessage()
+def get_server_stats(context):
+    snapshot = stats.snapshot()
+    message = messagePool.acquire()
+    try:
+        message.body.description = "Server stats, latencies in microseconds."
+        message.type = message_pb2.Message.MessageType.STATS_RESPONSE
+        message.stats.requests = snapshot["requests"]
+        message.stats.bytes_in = snapshot["bytesIn"]
+        message.stats.bytes_out = snapshot["bytesOut"]
+        message.stats.active_connections = max(snapshot["activeConnections"], 0)
+        message.stats.errors = snapshot["errors"]
+        for name, summary in sorted(snapshot["latencyByType"].items()):
+            latency = message.stats.latencies.add()
+            latency.type = message_pb2.Message.MessageType.Value(name)
+            latency.count = summary["count"]
+            latency.mean = summary["mean"]
+            latency.min = summary["min"]
+            latency.p50 = summary["p50"]
+            latency.p90 = summary["p90"]
+            latency.p99 = summary["p99"]
+            latency.p999 = summary["p999"]
+            latency.max = summary["max"]
+        return message.SerializeToString() + SERVER_SENDER
+    finally:
+        messagePool.release(message)
+
+def register_sensor(context):
+    # Any message a sensor sends proves it is alive and tells where it answers
+    sensorRegistry.updateFromMessage(context.message, context.peer, context.receivedAt)
+    sensorRegistry.expire(context.receivedAt)
+    # Readings and status updates carry a typed payload, kept for apps to read later
+    sensorStore.ingest(context.message, context.receivedAt)
+    return sensorAcks[context.message.type]
+
+def read_sensor_data(context):
+    # Stored readings are answered right away, read_mode ROLLUP asks for per-minute means instead of the
+    # latest samples, RANGE for the samples between since_ms and until_ms and LIVE for a fresh reading
+    # from the sensor itself
+    message = context.message
+    if message.HasField("target_id") and message.read_mode != message_pb2.Message.ReadMode.LIVE:
+        response = getStoredReading(message)
+        if response is not None:
+            return response
+    return forward_to_sensor(context)
+
+def getStoredReading(request):
+    # READ_SENSOR_DATA_RESPONSE from the sensor store, as if the sensor had sent it. None when nothing is stored.
+    sensorId = request.target_id
+    message = messagePool.acquire()
+    try:
+        if request.read_mode == message_pb2.Message.ReadMode.RANGE:
+            since = request.since_ms if request.HasField("since_ms") else None
+            until = request.until_ms if request.HasField("until_ms") else None
+            found = sensorStore.fillRange(message.body.object, sensorId, since, until)
+        else:
+            found = sensorStore.fillReading(message.body.object, sensorId, request.read_mode == message_pb2.Message.ReadMode.ROLLUP)
+        if not found:
+            return None
+        message.body.description = ""
+        message.type = message_pb2.Message.MessageType.READ_SENSOR_DATA_RESPONSE
+        sensor = sensorRegistry.get(sensorId)
+        if sensor is not None:
+            sender = serializeSender(sensor.ip, sensor.port, sensorId, sensor.sensorType)
+        else:
+            # Expired from the registry, the id still tells whose reading it is
+            sender = serializeSender("localhost", NOT_LISTENING, sensorId)
+        return message.SerializeToString() + sender
+    finally:
+        messagePool.release(message)
+
+def forward_to_sensor(context):
+    # Requests with a target_id go to that sensor and its response goes back to the client.
+    # Without one there is nobody to ask, the server answers as it always did.
+    message = context.message
+    if not message.HasField("target_id"):
+        return sensorAcks[message.type]
+    sensor = sensorRegistry.get(message.target_id)
+    if sensor is None:
+        response = askSiblingWorkers(context)
+        if response is not None:
+            return response
+        return getProtoMessage("Unknown sensor %s."%(message.target_id))
+    if sensor.port == NOT_LISTENING:
+        return getProtoMessage("Sensor %s does not take requests."%(sensor.sensorId))
+    if isServerAddress(sensor.ip, sensor.port):
+        # A sender that claims the server's own address would have the request forwarded back here forever
+        stats.recordError()
+        return getProtoMessage("Sensor %s advertises this server's address %s:%s."%(sensor.sensorId, sensor.ip, sensor.port))
 
-def getProtoMessage(description="teste"):
+    try:
+        response = getSensorPool(sensor.ip, sensor.port).request(getForwardedRequest(context, sensor))
+    except (socket.error, ValueError) as e:
+        stats.recordError()
+        return getProtoMessage("Sensor %s at %s:%s is unreachable: %s"%(sensor.sensorId, sensor.ip, sensor.port, e))
+    storeForwardedResponse(response)
+    return response
+
+def storeForwardedResponse(response):
+    # A status change or a live reading is the sensor's latest state, stored reads must not answer an older one
     message = message_pb2.Message()
-    message.body.description = description
-    message.type = message_pb2.Message.MessageType.DEFAULT
-    message.sender.ip = "localhost"
-    message.sender.port = 5050
-    return message.SerializeToString()
+    try:
+        message.ParseFromString(response)
+    except Exception as e:
+        log.warning("Could not store a forwarded response: %s", e)
+        return
+    if message.type in (message_pb2.Message.MessageType.CHANGE_SENSOR_STATUS_RESPONSE, message_pb2.Message.MessageType.READ_SENSOR_DATA_RESPONSE):
+        sensorStore.ingest(message, time.time())
+
+def getForwardedRequest(context, sensor):
+    # The copy sent to a sensor goes without target_id, so whatever listens there answers it instead of
+    # forwarding it again. A process hosting several sensors still needs it to pick the right one.
+    message = context.message
+    if len(sensorRegistry.findByAddress(sensor.ip, sensor.port)) > 1:
+        # raw is a view of the engine's buffer, batch items have none
+        return bytes(context.raw) if context.raw is not None else message.SerializeToString()
+    forwarded = messagePool.acquire()
+    try:
+        forwarded.CopyFrom(message)
+        forwarded.ClearField("target_id")
+        return forwarded.SerializeToString()
+    finally:
+        messagePool.release(forwarded)
+
+def isServerAddress(ip, port):
+    if serverAddress is None or port != serverAddress[1]:
+        return False
+    return ip in LOCAL_ADDRESSES or ip == serverAddress[0]
+
+def isBlockingRequest(context):
+    # True when handling the request may wait on a sensor or on the disk, the async engine runs those off its loop
+    message = context.message
+    if message.type == message_pb2.Message.MessageType.BATCH_REQUEST:
+        return any(isBlocking(item) for item in message.batch.messages)
+    return isBlocking(message)
+
+def isBlocking(message):
+    if not message.HasField("target_id"):
+        return False
+    if message.type == message_pb2.Message.MessageType.CHANGE_SENSOR_STATUS_REQUEST:
+        return True
+    if message.type == message_pb2.Message.MessageType.READ_SENSOR_DATA_REQUEST:
+        # Answered from memory when the store has something, see read_sensor_data. Ranges read segment files.
+        return message.read_mode in (message_pb2.Message.ReadMode.LIVE, message_pb2.Message.ReadMode.RANGE) or message.target_id not in sensorStore
+    return False
+
+def askSiblingWorkers(context):
+    # The response of the first other worker that knows the target sensor, None when none does
+    if siblingPorts is None or getattr(siblingThread, "serving", False):
+        return None
+    message = context.message
+    serialized = bytes(context.raw) if context.raw is not None else message.SerializeToString()
+    for index, port in enumerate(siblingPorts):
+        if index == workerIndex or not port:
+            continue
+        try:
+            # The other worker may itself wait on the sensor for SENSOR_REQUEST_TIMEOUT
+            response = getSensorPool("127.0.0.1", port, 2 * SENSOR_REQUEST_TIMEOUT).request(serialized)
+        except (socket.error, ValueError) as e:
+            log.warning("Worker %s did not answer: %s", index, e)
+            continue
+        sibling = message_pb2.Message()
+        sibling.ParseFromString(response)
+        # Answers of, or for, the sensor carry its id, a worker that does not know it answers as the server
+        if sibling.sender.sensor_id:
+            return response
+    return None
+
+def handleSiblingRequest(context):
+    # Requests other workers pass on, they are never passed on again
+    siblingThread.serving = True
+    return handleRequest(context)
+
+def startSiblingServer(index, ports):
+    # Loopback server answering the other workers, its port is published in ports[index]
+    global workerIndex, siblingPorts
+    server = ThreadedServer("127.0.0.1", 0, handleSiblingRequest, name="Worker %s sibling server"%(index), workers=SIBLING_SERVER_WORKERS)
+    workerIndex = index
+    siblingPorts = ports
+    ports[index] = server.port
+    thread = threading.Thread(target = server.startTCPServer)
+    thread.daemon = True
+    thread.start()
+    return thread
+
+def getSensorPool(ip, port, timeout=SENSOR_REQUEST_TIMEOUT):
+    pool = sensorPools.get((ip, port))
+    if pool is None:
+        with sensorPoolsLock:
+            pool = sensorPools.get((ip, port))
+            if pool is None:
+                # A sensor that does not answer must not hold the client up for long, so no retries, and
+                # no longer wait for a connection busy with it than for the sensor itself
+                pool = sensorPools[(ip, port)] = ConnectionPool(ip, port, timeout=timeout, maxAttempts=1, acquireTimeout=timeout)
+    return pool
+
+def getProtoMessage(description="teste", messageType=message_pb2.Message.MessageType.DEFAULT):
+    # Pooled message, the server's sender is always the same so it is appended already serialized
+    message = messagePool.acquire()
+    try:
+        message.body.description = description
+        message.type = messageType
+        return message.SerializeToString() + SERVER_SENDER
+    finally:
+        messagePool.release(message)
 
 def parseMessage(serialized_message_string):
     message = message_pb2.Message()
     message.ParseFromString(serialized_message_string)
     return message
 
+def startServer(ip, port, engine, reusePort=False):
+    global serverAddress
+    serverAddress = (ip, port)
+    if engine == "async":
+        # Single event loop serving every client, needs Python 3.7+
+        from asyncServer import AsyncServer
+        AsyncServer(ip, port, handleRequest, reusePort=reusePort, isBlocking=isBlockingRequest).startTCPServer()
+    else:
+        ThreadedServer(ip, port, handleRequest, reusePort=reusePort).startTCPServer()
+
+def startWorker(index, workerStats, ip, port, engine, discoveryInterval=None, workerPorts=None):
+    # Runs inside each process forked by MultiProcessLauncher
+    stats.shareWith(workerStats, index)
+    if workerPorts is not None:
+        startSiblingServer(index, workerPorts)
+    if discoveryInterval:
+        # Every worker routes requests with its own registry, so each one looks for the sensors
+        findSensorsOnTheInternet(MULTICAST_GROUP_IP, MULTICAST_GROUP_PORT, discoveryInterval)
+    startServer(ip, port, engine, reusePort=True)
+
+# MARK: Dispatch registry
+# Message type -> handler(message) returning the serialized response
+messageHandlers = {}
+# Message type -> serialized response that never changes
+staticResponses = {}
+INVALID_MESSAGE_TYPE_RESPONSE = getProtoMessage("Invalid message type.")
+# Everything in a batch ack but the batch itself
+BATCH_ACK_RESPONSE = getProtoMessage("Batch handled.", message_pb2.Message.MessageType.BATCH_ACK)
+# Message type -> serialized response of the sensor messages that are registered or forwarded, when there is nothing else to say
+sensorAcks = dict((messageType, getProtoMessage()) for messageType in (
+    message_pb2.Message.MessageType.CHANGE_SENSOR_STATUS_REQUEST,
+    message_pb2.Message.MessageType.CHANGE_SENSOR_STATUS_RESPONSE,
+    message_pb2.Message.MessageType.READ_SENSOR_DATA_REQUEST,
+    message_pb2.Message.MessageType.READ_SENSOR_DATA_RESPONSE,
+    message_pb2.Message.MessageType.MULTICAST_SENSOR_FINDER_ACK,
+))
+
+registerHandler(message_pb2.Message.MessageType.CHANGE_SENSOR_STATUS_REQUEST, forward_to_sensor) # Used by app and server to request sensor status
+registerHandler(message_pb2.Message.MessageType.CHANGE_SENSOR_STATUS_RESPONSE, register_sensor) # Used by sensor to send sensor status
+
+registerHandler(message_pb2.Message.MessageType.READ_SENSOR_DATA_REQUEST, read_sensor_data) # Used by app and server to request sensor data
+registerHandler(message_pb2.Message.MessageType.READ_SENSOR_DATA_RESPONSE, register_sensor) # Used by sensor to send sensor data
+
+registerStaticResponse(message_pb2.Message.MessageType.MULTICAST_SENSOR_FINDER) # Used by server to find sensors on the internet
+registerHandler(message_pb2.Message.MessageType.MULTICAST_SENSOR_FINDER_ACK, register_sensor) # Used by sensor to show up it is alive
+
+registerStaticResponse(message_pb2.Message.MessageType.MULTICAST_SERVER_FINDER) # Used by sensor to find server on the internet
+registerStaticResponse(message_pb2.Message.MessageType.MULTICAST_SERVER_FINDER_ACK) # Used by server to show up it is alive
+
+registerHandler(message_pb2.Message.MessageType.UPTIME_REQUEST, get_server_uptime) # Used by app to get datetime since server's up
+registerHandler(message_pb2.Message.MessageType.UPTIME_RESPONSE, get_server_uptime) # Used by server to send datetime since it's up
+
+registerHandler(message_pb2.Message.MessageType.REQNUM_REQUEST, get_server_reqnum) # Used by app to get the number of requests since server's up
+registerHandler(message_pb2.Message.MessageType.REQNUM_RESPONSE, get_server_reqnum) # Used by server to send the number of requests since it's up
+
+registerHandler(message_pb2.Message.MessageType.STATS_REQUEST, get_server_stats) # Used by app to get the server's traffic and latency stats
+registerHandler(message_pb2.Message.MessageType.STATS_RESPONSE, get_server_stats) # Used by server to send its stats
+
+registerStaticResponse(message_pb2.Message.MessageType.CLOSE_CONNECTION_REQUEST) # Used by app to attempt closing connection
+registerStaticResponse(message_pb2.Message.MessageType.CLOSE_CONNECTION_ACK) # Used by server to acknowledge
+
+registerHandler(message_pb2.Message.MessageType.BATCH_REQUEST, handle_batch) # Used by sensors to upload many messages at once
+registerStaticResponse(message_pb2.Message.MessageType.BATCH_ACK) # Used by server to answer every message of a batch at once
+
 # MARK: Init main()
 def main():
     # 1 cli-svr
     # findSensorsOnTheInternet(MULTICAST_GROUP_IP, MULTICAST_GROUP_PORT)
 
     # 2 svr-cli
-    # MulticastReceiver("" , MULTICAST_GROUP_PORT, MULTICAST_GROUP_IP).waitForSensorFinderSignal()
+    # from multicastReceiver import MulticastReceiver
+    # MulticastReceiver("" , MULTICAST_GROUP_PORT, MULTICAST_GROUP_IP, handleRequest).waitForFinderSignal()
 
     # 3 svr-cli
     try:
-        ip = raw_input("Enter an ip address to this server (Ex.: 'localhost', '127.0.0.1', ''): ")
-        port = int(raw_input("Enter a port: "))
-        ThreadedServer(str(ip), int(port)).startTCPServer()
+        ip = input("Enter an ip address to this server (Ex.: 'localhost', '127.0.0.1', ''): ")
+        port = int(input("Enter a port: "))
+        engine = input("Choose a server engine, 'threaded' or 'async' (default 'threaded'): ") or "threaded"
+        processes = int(input("Enter the number of worker processes (default 1): ") or 1)
+        metricsPort = int(input("Enter a port for Prometheus metrics (default none): ") or 0)
+        discoveryInterval = float(input("Enter the seconds between two multicast sensor discoveries (default none): ") or 0)
+        if processes > 1:
+            # One server per process sharing the port, so parsing and serialization scale across cores
+            # Loopback port of every worker, published by the worker itself once it listens
+            workerPorts = multiprocessing.Array("i", processes, lock=False)
+            launcher = MultiProcessLauncher(processes, startWorker, (str(ip), int(port), engine, discoveryInterval, workerPorts))
+            if metricsPort:
+                # Served by this process, adding up what every worker publishes
+                stats.shareWith(launcher.workerStats)
+                MetricsServer(str(ip), metricsPort).start()
+            launcher.start()
+        else:
+            if metricsPort:
+                MetricsServer(str(ip), metricsPort).start()
+            if discoveryInterval:
+                findSensorsOnTheInternet(MULTICAST_GROUP_IP, MULTICAST_GROUP_PORT, discoveryInterval)
+            startServer(str(ip), int(port), engine)
     except ValueError as e:
         print(e)
 
-print("\n** Welcome to my SocketProtobuf app! Send a message using Protobuffer in TCP/UDP mode! **\n\n")
-main()
-print("** This is the end! **")
\ No newline at end of file
+if __name__ == "__main__":
+    print("\n** Welcome to my SocketProtobuf app! Send a message using Protobuffer in TCP/UDP mode! **\n\n")
+    main()
+    print("** This is the end! **")
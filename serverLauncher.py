@@ -0,0 +1,34 @@
+import multiprocessing
+
+from serverStats import WORKER_STATS_SIZE
+
+# MARK: Classes definitions
+# ********************************** MultiProcessLauncher **********************************
+class MultiProcessLauncher(object):
+    # MARK: Constructor
+    def __init__(self, workers, target, args=()):
+        self.workers = workers
+        # Runs in every worker process as target(workerIndex, workerStats, *args) and must
+        # bind its own SO_REUSEPORT socket, so the kernel spreads connections across workers
+        self.target = target
+        self.args = args
+        # One row of stats per worker. Each row has a single writer, so no lock is shared
+        # across processes and readers just sum all rows.
+        self.workerStats = multiprocessing.Array("Q", workers * WORKER_STATS_SIZE, lock=False)
+        self.processes = []
+
+    # MARK: Methods
+    def start(self):
+        for workerIndex in range(self.workers):
+            process = multiprocessing.Process(target = self.target, args = (workerIndex, self.workerStats) + tuple(self.args))
+            process.start()
+            self.processes.append(process)
+            print("Worker %s started with PID %s"%(workerIndex, process.pid))
+
+        try:
+            for process in self.processes:
+                process.join()
+        except KeyboardInterrupt:
+            for process in self.processes:
+                process.terminate()
+# ********************************** MultiProcessLauncher **********************************
@@ -0,0 +1,227 @@
+import threading
+import time
+import message_pb2
+
+from latencyHistogram import HISTOGRAM_LIST_SIZE
+from latencyHistogram import LatencyHistogram
+from latencyHistogram import histogramFromList
+
+# MARK: Constants
+# MessageType values are small, so requests by type are counted in a list indexed by the value
+MESSAGE_TYPE_SLOTS = max(message_pb2.Message.MessageType.values()) + 1
+COUNTER_NAMES = ("bytesIn", "bytesOut", "connectionsOpened", "connectionsClosed", "errors")
+# Slots every worker process owns in the shared stats array: the counters, requests by type,
+# then a latency histogram per type
+LATENCY_OFFSET = len(COUNTER_NAMES) + MESSAGE_TYPE_SLOTS
+WORKER_STATS_SIZE = LATENCY_OFFSET + MESSAGE_TYPE_SLOTS * HISTOGRAM_LIST_SIZE
+# Seconds between two publications of a worker's totals to the other workers
+PUBLISH_INTERVAL = 0.25
+# Merging histograms costs far more than summing counters (milliseconds, not microseconds), so they are
+# published less often and their summaries are recomputed at most once per interval
+LATENCY_PUBLISH_INTERVAL = 1.0
+
+# MARK: Classes definitions
+# ********************************** StatsShard **********************************
+class StatsShard(object):
+    # Counters of a single thread. Only that thread writes them, so updates need no lock
+    # and readers, summing every shard, at worst see a count that is a few requests behind.
+    __slots__ = COUNTER_NAMES + ("requestsByType", "latencies")
+
+    # MARK: Constructor
+    def __init__(self):
+        self.bytesIn = 0
+        self.bytesOut = 0
+        self.connectionsOpened = 0
+        self.connectionsClosed = 0
+        self.errors = 0
+        self.requestsByType = [0] * MESSAGE_TYPE_SLOTS
+        # LatencyHistogram of every message type, created on its first request
+        self.latencies = [None] * MESSAGE_TYPE_SLOTS
+# ********************************** StatsShard **********************************
+
+# ********************************** ServerStats **********************************
+class ServerStats(object):
+    # MARK: Constructor
+    def __init__(self):
+        self.local = threading.local()
+        # Shards of every thread that recorded something, only locked when a thread records for the first time
+        self.shardsLock = threading.Lock()
+        self.shards = []
+        # Shared by every worker process when running under the multi-process launcher
+        self.workerStats = None
+        # Row of this process in workerStats, None when it only reads the workers' stats
+        self.workerIndex = None
+        self.latencySummaries = {}
+        self.latencySummariesAt = 0
+
+    # MARK: Recording, called on the hot path
+    def recordRequest(self, messageType):
+        self.shard().requestsByType[messageType] += 1
+
+    def recordLatency(self, messageType, microseconds):
+        latencies = self.shard().latencies
+        histogram = latencies[messageType]
+        if histogram is None:
+            histogram = latencies[messageType] = LatencyHistogram()
+        histogram.record(microseconds)
+
+    def recordBytesIn(self, size):
+        self.shard().bytesIn += size
+
+    def recordBytesOut(self, size):
+        self.shard().bytesOut += size
+
+    def recordConnectionOpened(self):
+        self.shard().connectionsOpened += 1
+
+    def recordConnectionClosed(self):
+        self.shard().connectionsClosed += 1
+
+    def recordError(self):
+        self.shard().errors += 1
+
+    # MARK: Reading
+    def totalRequests(self):
+        return sum(self.totals()[len(COUNTER_NAMES):])
+
+    def snapshot(self):
+        # Everything as a dict of plain values, latencies in microseconds
+        totals = self.totals()
+        counters = dict(zip(COUNTER_NAMES, totals))
+        requestsByType = totals[len(COUNTER_NAMES):]
+        return {
+            "requests": sum(requestsByType),
+            "requestsByType": dict((name, requestsByType[value]) for name, value in message_pb2.Message.MessageType.items() if requestsByType[value]),
+            "bytesIn": counters["bytesIn"],
+            "bytesOut": counters["bytesOut"],
+            "activeConnections": counters["connectionsOpened"] - counters["connectionsClosed"],
+            "errors": counters["errors"],
+            "latencyByType": self.latencyByType(),
+        }
+
+    def latencyByType(self):
+        # Message type name -> latency summary, at most LATENCY_PUBLISH_INTERVAL old
+        now = time.time()
+        if now - self.latencySummariesAt >= LATENCY_PUBLISH_INTERVAL:
+            self.latencySummaries = dict((message_pb2.Message.MessageType.Name(messageType), histogram.summary()) for messageType, histogram in self.latencies().items())
+            self.latencySummariesAt = now
+        return self.latencySummaries
+
+    def totals(self):
+        # This process' live totals, plus what the other workers published last
+        totals = self.localTotals()
+        for start in self.otherWorkerRows():
+            row = self.workerStats[start:start + LATENCY_OFFSET]
+            totals = [total + value for total, value in zip(totals, row)]
+        return totals
+
+    def latencies(self):
+        # Message type -> LatencyHistogram of every thread and every worker process
+        latencies = self.localLatencies()
+        for start in self.otherWorkerRows():
+            requestsByType = self.workerStats[start + len(COUNTER_NAMES):start + LATENCY_OFFSET]
+            for messageType, count in enumerate(requestsByType):
+                if count:
+                    histogramStart = start + LATENCY_OFFSET + messageType * HISTOGRAM_LIST_SIZE
+                    histogram = histogramFromList(self.workerStats[histogramStart:histogramStart + HISTOGRAM_LIST_SIZE])
+                    latencies.setdefault(messageType, LatencyHistogram()).merge(histogram)
+        return latencies
+
+    def otherWorkerRows(self):
+        # Where the row of every other worker process starts in workerStats
+        if self.workerStats is None:
+            return []
+        return [index * WORKER_STATS_SIZE for index in range(len(self.workerStats) // WORKER_STATS_SIZE) if index != self.workerIndex]
+
+    def localTotals(self):
+        with self.shardsLock:
+            shards = list(self.shards)
+        totals = [0] * LATENCY_OFFSET
+        for shard in shards:
+            for slot, name in enumerate(COUNTER_NAMES):
+                totals[slot] += getattr(shard, name)
+            for value, count in enumerate(shard.requestsByType):
+                totals[len(COUNTER_NAMES) + value] += count
+        return totals
+
+    def localLatencies(self):
+        with self.shardsLock:
+            shards = list(self.shards)
+        latencies = {}
+        for shard in shards:
+            for messageType, histogram in enumerate(shard.latencies):
+                if histogram is not None:
+                    latencies.setdefault(messageType, LatencyHistogram()).merge(histogram)
+        return latencies
+
+    # MARK: Sharing across worker processes
+    def shareWith(self, workerStats, workerIndex=None):
+        # workerStats has WORKER_STATS_SIZE slots per worker and each worker only writes its own,
+        # so no lock is shared across processes. Without a workerIndex the stats of the workers are only read.
+        self.workerStats = workerStats
+        self.workerIndex = workerIndex
+        if workerIndex is not None:
+            publisher = threading.Thread(target = self.publishForever)
+            publisher.daemon = True
+            publisher.start()
+
+    def publishForever(self):
+        start = self.workerIndex * WORKER_STATS_SIZE
+        latenciesPublishedAt = 0
+        while True:
+            self.workerStats[start:start + LATENCY_OFFSET] = self.localTotals()
+            if time.time() - latenciesPublishedAt >= LATENCY_PUBLISH_INTERVAL:
+                for messageType, histogram in self.localLatencies().items():
+                    histogramStart = start + LATENCY_OFFSET + messageType * HISTOGRAM_LIST_SIZE
+                    self.workerStats[histogramStart:histogramStart + HISTOGRAM_LIST_SIZE] = histogram.toList()
+                latenciesPublishedAt = time.time()
+            time.sleep(PUBLISH_INTERVAL)
+
+    # MARK: Methods
+    def shard(self):
+        try:
+            return self.local.shard
+        except AttributeError:
+            shard = self.local.shard = StatsShard()
+            with self.shardsLock:
+                self.shards.append(shard)
+            return shard
+# ********************************** ServerStats **********************************
+
+# MARK: Functions
+serverStats = None
+
+def getServerStats():
+    # One per process, shared by the engines and the request handlers
+    global serverStats
+    if serverStats is None:
+        serverStats = ServerStats()
+    return serverStats
+
+def prometheusText(snapshot):
+    # A ServerStats.snapshot() in the Prometheus text exposition format
+    lines = [
+        "# HELP socketprotobuf_requests_total Requests handled, batch items included.",
+        "# TYPE socketprotobuf_requests_total counter",
+    ]
+    for name, count in sorted(snapshot["requestsByType"].items()):
+        lines.append('socketprotobuf_requests_total{type="%s"} %s'%(name, count))
+
+    for metric, key, kind, description in (
+        ("socketprotobuf_received_bytes_total", "bytesIn", "counter", "Bytes received from clients."),
+        ("socketprotobuf_sent_bytes_total", "bytesOut", "counter", "Bytes sent to clients."),
+        ("socketprotobuf_active_connections", "activeConnections", "gauge", "Clients connected right now."),
+        ("socketprotobuf_errors_total", "errors", "counter", "Dropped clients, broken frames and unknown message types."),
+    ):
+        lines.append("# HELP %s %s"%(metric, description))
+        lines.append("# TYPE %s %s"%(metric, kind))
+        lines.append("%s %s"%(metric, snapshot[key]))
+
+    lines.append("# HELP socketprotobuf_request_latency_microseconds Time spent handling a request, by message type.")
+    lines.append("# TYPE socketprotobuf_request_latency_microseconds summary")
+    for name, summary in sorted(snapshot["latencyByType"].items()):
+        for quantile, key in (("0.5", "p50"), ("0.9", "p90"), ("0.99", "p99"), ("0.999", "p999")):
+            lines.append('socketprotobuf_request_latency_microseconds{type="%s",quantile="%s"} %s'%(name, quantile, summary[key]))
+        lines.append('socketprotobuf_request_latency_microseconds_sum{type="%s"} %s'%(name, summary["mean"] * summary["count"]))
+        lines.append('socketprotobuf_request_latency_microseconds_count{type="%s"} %s'%(name, summary["count"]))
+    return "\n".join(lines) + "\n"
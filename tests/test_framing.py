@@ -0,0 +1,98 @@
+import unittest
+
+from framing import DEFAULT_BUFFER_CAPACITY
+from framing import MIN_READ_SIZE
+from framing import FrameBuffer
+from framing import encodeFrame
+
+# MARK: Functions
+def receive(frameBuffer, data, chunkSize):
+    # Push data through writableView/bufferUpdated chunkSize bytes at a time, like recv_into would
+    frames = []
+    offset = 0
+    while offset < len(data):
+        view = frameBuffer.writableView()
+        size = min(len(view), chunkSize, len(data) - offset)
+        view[:size] = data[offset:offset + size]
+        offset += size
+        # Frames are views of the buffer, only valid until the next read
+        frames.extend(bytes(frame) for frame in frameBuffer.bufferUpdated(size))
+    return frames
+
+# MARK: Classes definitions
+# ********************************** FrameBufferTest **********************************
+class FrameBufferTest(unittest.TestCase):
+    def testCoalescedFramesAreCutFromOneRead(self):
+        payloads = [b"a" * size for size in (0, 1, 100, 5000)]
+        frames = FrameBuffer().feed(b"".join(encodeFrame(payload) for payload in payloads))
+        self.assertEqual([bytes(frame) for frame in frames], payloads)
+
+    def testFramesSplitAcrossReads(self):
+        payloads = [bytes(bytearray(range(256))) * (index + 1) for index in range(20)]
+        data = b"".join(encodeFrame(payload) for payload in payloads)
+        for chunkSize in (1, 3, 4, 7, 1000, MIN_READ_SIZE):
+            self.assertEqual(receive(FrameBuffer(), data, chunkSize), payloads)
+
+    def testPartialFrameIsCompactedToTheFront(self):
+        frameBuffer = FrameBuffer(capacity=MIN_READ_SIZE)
+        first = b"x" * (MIN_READ_SIZE - 100)
+        second = b"y" * 200
+        data = encodeFrame(first) + encodeFrame(second)
+        self.assertEqual(receive(frameBuffer, data, MIN_READ_SIZE), [first, second])
+        self.assertEqual(len(frameBuffer.buffer), MIN_READ_SIZE)
+
+    def testOversizedHeaderIsRejected(self):
+        frameBuffer = FrameBuffer(maxFrameSize=1024)
+        with self.assertRaises(ValueError):
+            frameBuffer.feed(encodeFrame(b"z" * 1025))
+
+    def testHeaderAloneDoesNotReserveTheClaimedSize(self):
+        frameBuffer = FrameBuffer()
+        frameBuffer.feed(b"\x01\x00\x00\x00")
+        frameBuffer.writableView()
+        self.assertEqual(len(frameBuffer.buffer), DEFAULT_BUFFER_CAPACITY)
+
+    def testBufferGrowsForABigFrameThenShrinksBack(self):
+        frameBuffer = FrameBuffer()
+        payload = bytes(bytearray(index % 251 for index in range(300000)))
+        largest = 0
+        data = encodeFrame(payload) + encodeFrame(b"small")
+        frames = []
+        offset = 0
+        while offset < len(data):
+            view = frameBuffer.writableView()
+            size = min(len(view), 65536, len(data) - offset)
+            view[:size] = data[offset:offset + size]
+            offset += size
+            frames.extend(bytes(frame) for frame in frameBuffer.bufferUpdated(size))
+            largest = max(largest, len(frameBuffer.buffer))
+        self.assertEqual(frames, [payload, b"small"])
+        self.assertGreaterEqual(largest, len(payload))
+        # Never much more than twice what was received
+        self.assertLess(largest, 4 * len(payload))
+        self.assertEqual(len(frameBuffer.buffer), DEFAULT_BUFFER_CAPACITY)
+
+    def testRecvFrameKeepsExtraFramesAsBytes(self):
+        connection = FakeConnection([encodeFrame(b"one") + encodeFrame(b"two")[:5], encodeFrame(b"two")[5:]])
+        frameBuffer = FrameBuffer()
+        self.assertEqual(frameBuffer.recvFrame(connection), b"one")
+        self.assertEqual(frameBuffer.recvFrame(connection), b"two")
+        self.assertIsNone(frameBuffer.recvFrame(connection))
+# ********************************** FrameBufferTest **********************************
+
+# ********************************** FakeConnection **********************************
+class FakeConnection(object):
+    # Socket whose recv_into returns the given chunks, then end of stream
+    def __init__(self, chunks):
+        self.chunks = list(chunks)
+
+    def recv_into(self, view):
+        if not self.chunks:
+            return 0
+        chunk = self.chunks.pop(0)
+        view[:len(chunk)] = chunk
+        return len(chunk)
+# ********************************** FakeConnection **********************************
+
+if __name__ == "__main__":
+    unittest.main()
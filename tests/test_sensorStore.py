@@ -0,0 +1,168 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+import message_pb2
+
+from sensors.payloads import getTimestamps
+from sensors.payloads import setTimestamps
+from sensorStore import MAX_ROLLUPS
+from sensorStore import MAX_SAMPLES_PER_RANGE
+from sensorStore import RING_CAPACITY
+from sensorStore import ROLLUP_INTERVAL_MS
+from sensorStore import SEGMENT_SAMPLES
+from sensorStore import SegmentWriter
+from sensorStore import SensorSeries
+from sensorStore import SensorStore
+from sensorStore import SeriesRollups
+from sensorStore import isProcessAlive
+from sensorStore import removeStaleDirectories
+
+# MARK: Constants
+# Milliseconds of the first sample of every test
+FIRST_TIMESTAMP = 1700000000000
+
+# MARK: Functions
+def bowlReading(sensorId, timestamps):
+    message = message_pb2.Message()
+    message.type = message_pb2.Message.MessageType.READ_SENSOR_DATA_RESPONSE
+    message.body.description = ""
+    message.sender.sensor_id = sensorId
+    setTimestamps(message.body.object.bowl, timestamps)
+    message.body.object.bowl.grams.extend(index % 1000 for index in range(len(timestamps)))
+    return message
+
+def waitForWriter(series, timeout=5.0):
+    # The writer drops a segment's columns from memory once the file is written
+    deadline = time.time() + timeout
+    while any(segment[4] is not None for segment in series.segments) and time.time() < deadline:
+        time.sleep(0.01)
+
+# MARK: Classes definitions
+# ********************************** SensorStoreTest **********************************
+class SensorStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def ingestSamples(self, store, sensorId, count, perReading=50):
+        for first in range(0, count, perReading):
+            timestamps = [FIRST_TIMESTAMP + index * 1000 for index in range(first, min(first + perReading, count))]
+            store.ingest(bowlReading(sensorId, timestamps), time.time())
+
+    def testRingWrapKeepsTheLatestSamples(self):
+        series = SensorSeries("bowl-0", "bowl", os.path.join(self.directory, "bowl-0"), SegmentWriter())
+        count = RING_CAPACITY + 100
+        series.append([(FIRST_TIMESTAMP + index, index) for index in range(count)])
+        self.assertEqual(len(series.columns[0]), RING_CAPACITY)
+        self.assertEqual(series.latest(3), [(FIRST_TIMESTAMP + index, index) for index in range(count - 3, count)])
+        self.assertEqual(len(series.latest(2 * RING_CAPACITY)), RING_CAPACITY)
+
+    def testSamplesSpanDiskAndMemory(self):
+        store = SensorStore(self.directory)
+        count = 5000
+        self.ingestSamples(store, "bowl-0", count)
+        series = store.getSeries("bowl-0")
+        self.assertEqual(series.spilled, count - count % SEGMENT_SAMPLES)
+
+        # Read once from the columns still held for the writer, once from the files
+        for _ in range(2):
+            rows = store.samples("bowl-0")
+            self.assertEqual([row[0] for row in rows], [FIRST_TIMESTAMP + index * 1000 for index in range(count)])
+            self.assertEqual([row[1] for row in rows], [index % 50 for index in range(count)])
+            waitForWriter(series)
+        self.assertTrue(all(os.path.exists(segment[3]) for segment in series.segments))
+
+        rows = store.samples("bowl-0", since=FIRST_TIMESTAMP + 100 * 1000, until=FIRST_TIMESTAMP + 200 * 1000)
+        self.assertEqual(len(rows), 101)
+
+    def testRemoveDeletesSegments(self):
+        store = SensorStore(self.directory)
+        self.ingestSamples(store, "bowl-0", 2 * SEGMENT_SAMPLES)
+        series = store.getSeries("bowl-0")
+        waitForWriter(series)
+        paths = [segment[3] for segment in series.segments]
+        self.assertEqual(len(paths), 2)
+
+        self.assertIs(store.remove("bowl-0"), series)
+        self.assertNotIn("bowl-0", store)
+        deadline = time.time() + 5.0
+        while any(os.path.exists(path) for path in paths) and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertFalse(any(os.path.exists(path) for path in paths))
+
+    def testRangeIsReadFromDiskAndMemory(self):
+        store = SensorStore(self.directory)
+        count = MAX_SAMPLES_PER_RANGE + RING_CAPACITY
+        self.ingestSamples(store, "bowl-0", count)
+        waitForWriter(store.getSeries("bowl-0"))
+
+        payload = message_pb2.Message.Object()
+        self.assertTrue(store.fillRange(payload, "bowl-0", FIRST_TIMESTAMP + 1000, FIRST_TIMESTAMP + 3000 * 1000))
+        self.assertEqual(getTimestamps(payload.bowl), [FIRST_TIMESTAMP + index * 1000 for index in range(1, 3001)])
+        # Without bounds, the oldest samples come first, up to the limit
+        payload = message_pb2.Message.Object()
+        self.assertTrue(store.fillRange(payload, "bowl-0"))
+        self.assertEqual(len(payload.bowl.grams), MAX_SAMPLES_PER_RANGE)
+        self.assertEqual(payload.bowl.base_timestamp_ms, FIRST_TIMESTAMP)
+        self.assertFalse(store.fillRange(payload, "bowl-1"))
+
+    def testIdleSeriesExpire(self):
+        store = SensorStore(self.directory, ttl=60)
+        store.ingest(bowlReading("bowl-0", [FIRST_TIMESTAMP]), 1000.0)
+        store.ingest(bowlReading("bowl-1", [FIRST_TIMESTAMP]), 1030.0)
+        self.assertEqual(store.expire(1070.0), ["bowl-0"])
+        self.assertNotIn("bowl-0", store)
+        self.assertIn("bowl-1", store)
+
+    def testOutOfOrderSamplesAreReadInTimeOrder(self):
+        # A sensor whose clock stepped back uploads samples older than the ones stored
+        store = SensorStore(self.directory)
+        store.ingest(bowlReading("bowl-0", [FIRST_TIMESTAMP + 3000, FIRST_TIMESTAMP + 4000]), time.time())
+        store.ingest(bowlReading("bowl-0", [FIRST_TIMESTAMP + 1000, FIRST_TIMESTAMP + 2000]), time.time())
+        payload = message_pb2.Message.Object()
+        self.assertTrue(store.fillReading(payload, "bowl-0"))
+        self.assertEqual(getTimestamps(payload.bowl), [FIRST_TIMESTAMP + index * 1000 for index in range(1, 5)])
+
+    def testStaleDirectoriesAreRemoved(self):
+        deadPid = next(pid for pid in range(4000000, 4100000) if not isProcessAlive(pid))
+        stale = os.path.join(self.directory, str(deadPid))
+        alive = os.path.join(self.directory, str(os.getpid()))
+        for directory in (stale, alive):
+            os.makedirs(directory)
+            open(os.path.join(directory, "bowl-0-0.seg"), "wb").close()
+        removeStaleDirectories(self.directory)
+        self.assertFalse(os.path.exists(stale))
+        self.assertTrue(os.path.exists(alive))
+# ********************************** SensorStoreTest **********************************
+
+# ********************************** SeriesRollupsTest **********************************
+class SeriesRollupsTest(unittest.TestCase):
+    def testSamplesOfABucketAreSummed(self):
+        rollups = SeriesRollups(1)
+        for offset, value in ((0, 10), (1000, 20), (ROLLUP_INTERVAL_MS, 5), (2000, 30)):
+            rollups.add((FIRST_TIMESTAMP + offset, value))
+        bucketStart = FIRST_TIMESTAMP - FIRST_TIMESTAMP % ROLLUP_INTERVAL_MS
+        self.assertEqual(rollups.rows(), [(bucketStart, 20.0), (bucketStart + ROLLUP_INTERVAL_MS, 5.0)])
+        self.assertEqual((rollups.mins[0][0], rollups.maxs[0][0]), (10, 30))
+
+    def testOldBucketsAreTrimmed(self):
+        rollups = SeriesRollups(1)
+        buckets = MAX_ROLLUPS * 5 // 4
+        for bucket in range(buckets):
+            rollups.add((bucket * ROLLUP_INTERVAL_MS, bucket))
+        self.assertEqual(len(rollups.bucketStarts), buckets)
+
+        # One more bucket goes past the limit, the oldest are dropped down to MAX_ROLLUPS
+        rollups.add((buckets * ROLLUP_INTERVAL_MS, buckets))
+        self.assertEqual(len(rollups.bucketStarts), MAX_ROLLUPS)
+        self.assertEqual(rollups.bucketStarts[0], (buckets + 1 - MAX_ROLLUPS) * ROLLUP_INTERVAL_MS)
+        self.assertEqual(rollups.rows(2), [(float((buckets - 1) * ROLLUP_INTERVAL_MS), float(buckets - 1)),
+                                           (float(buckets * ROLLUP_INTERVAL_MS), float(buckets))])
+# ********************************** SeriesRollupsTest **********************************
+
+if __name__ == "__main__":
+    unittest.main()
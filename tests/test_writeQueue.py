@@ -0,0 +1,90 @@
+import struct
+import unittest
+
+from framing import FrameBuffer
+from writeQueue import MAX_BUFFERS_PER_CALL
+from writeQueue import WriteQueue
+
+# MARK: Classes definitions
+# ********************************** FakeConnection **********************************
+class FakeConnection(object):
+    # Socket whose sendmsg takes at most the next of the given byte counts per call
+    def __init__(self, limits=None):
+        self.limits = list(limits or [])
+        self.written = bytearray()
+        self.calls = []
+
+    def sendmsg(self, buffers):
+        self.calls.append(len(buffers))
+        data = b"".join(bytes(buffer) for buffer in buffers)
+        if self.limits:
+            data = data[:self.limits.pop(0)]
+        self.written += data
+        return len(data)
+# ********************************** FakeConnection **********************************
+
+# ********************************** WriteQueueTest **********************************
+class WriteQueueTest(unittest.TestCase):
+    def payloads(self, count):
+        return [bytes(bytearray([index % 256])) * (index * 7 % 50 + 1) for index in range(count)]
+
+    def frames(self, data):
+        return [bytes(frame) for frame in FrameBuffer().feed(bytes(data))]
+
+    def testQueuedFramesAreWrittenInOneCall(self):
+        connection = FakeConnection()
+        writeQueue = WriteQueue(connection, maxQueueDelay=60)
+        payloads = self.payloads(10)
+        for payload in payloads:
+            writeQueue.append(payload)
+        self.assertEqual(connection.calls, [])
+        writeQueue.flush()
+        self.assertEqual(connection.calls, [20])
+        self.assertEqual(self.frames(connection.written), payloads)
+        self.assertEqual(writeQueue.queuedBytes, 0)
+
+    def testPartialWritesResumeMidBuffer(self):
+        # Limits end inside headers, inside payloads and right on buffer boundaries
+        payloads = self.payloads(30)
+        for limits in ([1] * 5 + [3, 4, 5, 9, 2, 17], [4, 1, 6, 100, 2, 3], [7] * 200):
+            connection = FakeConnection(limits)
+            writeQueue = WriteQueue(connection, maxQueueDelay=60)
+            for payload in payloads:
+                writeQueue.append(payload)
+            writeQueue.flush()
+            self.assertEqual(self.frames(connection.written), payloads)
+            self.assertEqual(writeQueue.buffers, [])
+            self.assertEqual(writeQueue.queuedBytes, 0)
+
+    def testConsumeKeepsTheUnwrittenTail(self):
+        writeQueue = WriteQueue(FakeConnection(), maxQueueDelay=60)
+        writeQueue.append(b"abcdef")
+        writeQueue.append(b"gh")
+        # Header (4) and 2 bytes of the first payload
+        writeQueue.consume(6)
+        self.assertEqual([bytes(buffer) for buffer in writeQueue.buffers], [b"cdef", struct.pack("!I", 2), b"gh"])
+        writeQueue.consume(9)
+        self.assertEqual([bytes(buffer) for buffer in writeQueue.buffers], [b"h"])
+        self.assertEqual(writeQueue.queuedBytes, 1)
+
+    def testBigQueueIsSplitAcrossCalls(self):
+        connection = FakeConnection()
+        writeQueue = WriteQueue(connection, maxQueuedBytes=1 << 30, maxQueueDelay=60)
+        payloads = self.payloads(MAX_BUFFERS_PER_CALL)
+        for payload in payloads:
+            writeQueue.append(payload)
+        writeQueue.flush()
+        self.assertEqual(connection.calls, [MAX_BUFFERS_PER_CALL, MAX_BUFFERS_PER_CALL])
+        self.assertEqual(self.frames(connection.written), payloads)
+
+    def testSizeThresholdFlushes(self):
+        connection = FakeConnection()
+        writeQueue = WriteQueue(connection, maxQueuedBytes=100, maxQueueDelay=60)
+        writeQueue.append(b"x" * 50)
+        self.assertEqual(connection.calls, [])
+        writeQueue.append(b"y" * 50)
+        self.assertEqual(connection.calls, [4])
+# ********************************** WriteQueueTest **********************************
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,202 @@
+import collections
+import select
+import socket
+import threading
+import time
+import sys
+import message_pb2
+
+from framing import FrameBuffer
+from framing import encodeFrame
+from framing import FRAME_HEADER_SIZE
+from writeQueue import WriteQueue
+from requestContext import parseRequest
+from serverStats import getServerStats
+from asyncLogger import DEBUG
+from asyncLogger import getLogger
+from myconfig import TIMEOUT
+
+# MARK: Constants
+log = getLogger("threadedServer")
+# Per-message records, sampled
+requestLog = getLogger("requests", sampled=True)
+# Threads serving TCP clients, each one takes care of a connection at a time
+MAX_WORKERS = 64
+# Accepted connections waiting for a free worker, clients beyond that are turned away
+ACCEPT_QUEUE_SIZE = 256
+# Seconds an accepted connection may wait for a free worker. Workers keep their connection for as long as
+# the client does, e.g. a sensor's pooled one, so a queued client may otherwise wait until one times out.
+ACCEPT_QUEUE_TIMEOUT = 5.0
+# Connections the kernel keeps for us while the accept loop is busy
+LISTEN_BACKLOG = 128
+
+# MARK: Classes definitions
+# ********************************** ThreadedServer **********************************
+class ThreadedServer(object):
+    # MARK: Constructor
+    def __init__(self, ip, port, handler, name="Server", workers=MAX_WORKERS, queueSize=ACCEPT_QUEUE_SIZE, backlog=LISTEN_BACKLOG, reusePort=False, queueTimeout=ACCEPT_QUEUE_TIMEOUT):
+        self.ip = ip
+        self.port = port
+        # Called as handler(context) with the RequestContext of every message, returns (stayInTouch, response)
+        self.handler = handler
+        self.name = name
+        self.stats = getServerStats()
+        self.workers = workers
+        self.backlog = backlog
+        # (connection, address, accepted at) of accepted connections waiting until a worker is free, oldest first
+        self.acceptQueue = collections.deque()
+        self.acceptQueueChanged = threading.Condition()
+        self.queueSize = queueSize
+        self.queueTimeout = queueTimeout
+
+        try:
+            self.serverSocket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            # [Errno 98] Address already in use
+            # the SO_REUSEADDR flag tells the kernel to reuse a local socket in TIME_WAIT state, 
+            # without waiting for its natural timeout to expire.
+            self.serverSocket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            # SO_REUSEPORT lets several worker processes bind the same port,
+            # the kernel then balances incoming connections between them.
+            if reusePort:
+                self.serverSocket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        except socket.error as e:
+            print("Failed to create socket: %s"%(e))
+            sys.exit()
+
+        try:
+            self.serverSocket.bind((self.ip, self.port))
+            # Port 0 asks the kernel for a free port, keep the one actually bound
+            self.port = self.serverSocket.getsockname()[1]
+            # Server's up
+            print("%s is up and ready to receive connections in TCP MODE! IP '%s' and PORT '%s'"%(self.name, self.ip, self.port))
+        except socket.error as e:
+            print("Failed to bind: %s"%(e))
+            sys.exit()
+
+    # MARK: Methods
+    def startTCPServer(self):
+        # Listen for connections made to the socket. The backlog argument specifies the maximum number of 
+        # queued connections and should be at least 0; the maximum value is system-dependent (usually 5), 
+        # the minimum value is forced to 0.
+        self.serverSocket.listen(self.backlog)
+
+        # A fixed number of threads handle simultaneous clients, so a connection storm cannot exhaust memory
+        for _ in range(self.workers):
+            worker = threading.Thread(target = self.serveQueuedConnections)
+            worker.daemon = True
+            worker.start()
+
+        while True:
+            # Wait until a client connects, waking up now and then to turn away those waiting too long
+            readable, _, _ = select.select([self.serverSocket], [], [], self.queueTimeout / 2)
+            if readable:
+                clientConnection, clientAddress = self.serverSocket.accept()
+                clientConnection.settimeout(TIMEOUT)
+                if not self.queueConnection(clientConnection, clientAddress):
+                    # Every worker is busy and the queue is full, tell the client to come back later
+                    self.rejectTCPClientConnection(clientConnection, clientAddress)
+            for clientConnection, clientAddress in self.takeStaleConnections():
+                self.rejectTCPClientConnection(clientConnection, clientAddress)
+
+    def queueConnection(self, clientConnection, clientAddress):
+        with self.acceptQueueChanged:
+            if len(self.acceptQueue) >= self.queueSize:
+                return False
+            self.acceptQueue.append((clientConnection, clientAddress, time.time()))
+            self.acceptQueueChanged.notify()
+            return True
+
+    def takeStaleConnections(self):
+        # Remove and return the connections queued for longer than queueTimeout
+        deadline = time.time() - self.queueTimeout
+        stale = []
+        with self.acceptQueueChanged:
+            while self.acceptQueue and self.acceptQueue[0][2] < deadline:
+                clientConnection, clientAddress, _ = self.acceptQueue.popleft()
+                stale.append((clientConnection, clientAddress))
+        return stale
+
+    def serveQueuedConnections(self):
+        while True:
+            with self.acceptQueueChanged:
+                while not self.acceptQueue:
+                    self.acceptQueueChanged.wait()
+                clientConnection, clientAddress, _ = self.acceptQueue.popleft()
+            self.stats.recordConnectionOpened()
+            try:
+                self.handleTCPClientConnection(clientConnection, clientAddress)
+            except Exception as e:
+                # Keep the worker alive no matter what went wrong with this client
+                log.warning("Lost client from IP %s: %s", clientAddress[0], e)
+                self.stats.recordError()
+                clientConnection.close()
+            finally:
+                self.stats.recordConnectionClosed()
+
+    def rejectTCPClientConnection(self, clientConnection, clientAddress):
+        log.warning("Server is overloaded, rejecting client from IP %s", clientAddress[0])
+        try:
+            clientConnection.sendall(encodeFrame(SERVER_BUSY_RESPONSE))
+        except socket.error:
+            pass
+        clientConnection.close()
+
+    def handleTCPClientConnection(self, clientConnection, clientAddress):
+        log.info("Client connected from IP %s", clientAddress[0])
+
+        # Messages arrive length-prefixed, a single recv may carry several of them or just a piece of one.
+        # They are received into the frame buffer and parsed right out of it.
+        frameBuffer = FrameBuffer()
+        # Responses are queued and written together, many frames per send call
+        writeQueue = WriteQueue(clientConnection)
+
+        # Stay in touch to client until he/she leaves
+        stayInTouch = True
+
+        while stayInTouch:
+            # Get client's messages
+            messagesFromClient = frameBuffer.recvFrames(clientConnection)
+            if messagesFromClient is None:
+                # Client went away without sending a CLOSE signal
+                break
+
+            # Traffic is added up per read and recorded once
+            bytesIn = 0
+            bytesOut = 0
+            for messageFromClient in messagesFromClient:
+                bytesIn += FRAME_HEADER_SIZE + len(messageFromClient)
+                # Parsed once, here, for logging and dispatch alike
+                context = parseRequest(messageFromClient, clientAddress)
+                requestLog.info("MESSAGE FROM IP %s: type %s, %s bytes", clientAddress[0], context.message.type, len(messageFromClient))
+                if requestLog.isEnabledFor(DEBUG):
+                    # The full dump is formatted by the log writer, the message is not reused
+                    requestLog.debug("MESSAGE FROM IP %s: %s", clientAddress[0], context.message)
+
+                # Handle the message according to received signal and send a response to client
+                stayInTouch, response = self.handler(context)
+                writeQueue.append(response)
+                bytesOut += FRAME_HEADER_SIZE + len(response)
+                if not stayInTouch:
+                    break
+            self.stats.recordBytesIn(bytesIn)
+            self.stats.recordBytesOut(bytesOut)
+
+            # Reply client before waiting for more, whatever is still queued goes out now
+            writeQueue.flush()
+
+        # Close connection when user sends a CLOSE signal
+        clientConnection.close()
+        log.info("Client disconnected from IP %s", clientAddress[0])
+# ********************************** ThreadedServer **********************************
+
+# MARK: Functions
+def getServerBusyResponse():
+    message = message_pb2.Message()
+    message.body.description = "Server is busy, try again later."
+    message.type = message_pb2.Message.MessageType.DEFAULT
+    message.sender.ip = "localhost"
+    message.sender.port = 5050
+    return message.SerializeToString()
+
+# Sent to clients turned away when every worker is busy
+SERVER_BUSY_RESPONSE = getServerBusyResponse()
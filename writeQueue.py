@@ -0,0 +1,66 @@
+import time
+
+from framing import FRAME_HEADER
+from messagePool import threadCounters
+
+# MARK: Constants
+# Queued bytes that trigger a write even though more responses may follow
+MAX_QUEUED_BYTES = 64 * 1024
+# Seconds the oldest queued response may wait for more responses to share its write
+MAX_QUEUE_DELAY = 0.002
+# Buffers a single sendmsg call takes, the kernel refuses more than IOV_MAX (1024 on Linux)
+MAX_BUFFERS_PER_CALL = 1024
+
+# MARK: Classes definitions
+# ********************************** WriteQueue **********************************
+class WriteQueue(object):
+    # Outgoing frames of one blocking socket. Headers and payloads are queued as they are, with no
+    # concatenation, and written together by a single sendmsg (writev) call whenever possible.
+    # MARK: Constructor
+    def __init__(self, connection, maxQueuedBytes=MAX_QUEUED_BYTES, maxQueueDelay=MAX_QUEUE_DELAY):
+        self.connection = connection
+        self.maxQueuedBytes = maxQueuedBytes
+        self.maxQueueDelay = maxQueueDelay
+        self.buffers = []
+        self.queuedBytes = 0
+        # When the oldest queued frame was added
+        self.queuedSince = 0
+
+    # MARK: Methods
+    def append(self, payload):
+        # Queue a frame, writing the queue out when it is big or old enough
+        if not self.buffers:
+            self.queuedSince = time.time()
+        self.buffers.append(FRAME_HEADER.pack(len(payload)))
+        self.buffers.append(payload)
+        self.queuedBytes += FRAME_HEADER.size + len(payload)
+        threadCounters().framesWritten += 1
+
+        if self.queuedBytes >= self.maxQueuedBytes or time.time() - self.queuedSince >= self.maxQueueDelay:
+            self.flush()
+
+    def flush(self):
+        # Write everything queued, partial writes included
+        counters = threadCounters()
+        while self.buffers:
+            if hasattr(self.connection, "sendmsg"):
+                sent = self.connection.sendmsg(self.buffers[:MAX_BUFFERS_PER_CALL])
+            else:
+                # Windows sockets have no sendmsg
+                sent = self.connection.send(b"".join(self.buffers[:MAX_BUFFERS_PER_CALL]))
+            counters.writeCalls += 1
+            self.consume(sent)
+
+    def consume(self, sent):
+        # Drop what the kernel took: whole buffers first, then the written part of the next one
+        self.queuedBytes -= sent
+        written = 0
+        for buffer in self.buffers:
+            if sent < len(buffer):
+                break
+            sent -= len(buffer)
+            written += 1
+        del self.buffers[:written]
+        if sent:
+            self.buffers[0] = memoryview(self.buffers[0])[sent:]
+# ********************************** WriteQueue **********************************